@@ -168,3 +168,34 @@ CACHES = {
 
 # Extends the default user model
 AUTH_USER_MODEL = "appaccount.User"
+
+# 42 Intra API client, see appcore.services.intra
+INTRA_API = {
+    # shared pooled client
+    "HTTP2": True,
+    "MAX_CONNECTIONS": 20,
+    "MAX_KEEPALIVE_CONNECTIONS": 20,
+    "KEEPALIVE_EXPIRY": 30,
+    "TIMEOUT": 30,
+    # concurrent requests in flight for AsyncIntra bulk helpers
+    "CONCURRENCY": 4,
+    # list endpoints, PAGE_SIZE is the API maximum
+    "PAGE_SIZE": 100,
+    "PAGE_CONCURRENCY": 4,
+    # shared token buckets in CACHES["default"], None disables a bucket
+    # set RATE_LIMIT_PER_HOUR to the hourly quota of the intra application, if it has one:
+    # a full update_intraprofile takes one request per cadet, which the default
+    # 1200/hour of a new application cannot serve within CELERY_TASK_TIME_LIMIT
+    "RATE_LIMIT_PER_SECOND": 2,
+    "RATE_LIMIT_PER_HOUR": None,
+    # retries on 429, 5xx and connection errors, see appcore.services.intra.retries
+    "RETRY_ATTEMPTS": 6,
+    "RETRY_BACKOFF": 0.5,
+    "RETRY_BACKOFF_MAX": 30,
+    # per-endpoint request metrics in Redis, see appcore.services.intra.instruments
+    "METRICS": True,
+}
+
+# GET responses of the data routes in CACHES["default"], see appcore.services.response_cache
+# entries are dropped whenever ingest commits, TIMEOUT is a safety net, None disables the cache
+RESPONSE_CACHE_TIMEOUT = 6 * 60 * 60
@@ -0,0 +1,387 @@
+import asyncio
+from datetime import datetime, timezone
+from time import monotonic
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from appcore.services.intra.bulk import BulkFetchResult
+from appcore.services.intra.clients import build_async_client
+from appcore.services.intra.instruments import current_run, record
+from appcore.services.intra.intra import Intra
+from appcore.services.intra.ratelimits import aacquire
+from appcore.services.intra.tokens import cached_access_token, get_access_token
+from appcore.services.intra.retries import (
+    retry_delay,
+    should_retry,
+    should_retry_error,
+)
+
+
+class AsyncIntra:
+    """
+    asyncio counterpart of Intra for bulk fetches.
+    Concurrency is bounded by a semaphore instead of sleeping between threads.
+
+    Usage:
+        async with AsyncIntra() as api:
+            users = await api.gather_users(logins, concurrency=4)
+        # users.results keyed by login, users.failures for the others
+    """
+
+    BASE = Intra.BASE
+
+    def __init__(self):
+        """
+        Initializes the async Intra API.
+        The access token is shared with the sync Intra, see appcore.services.intra.tokens.
+        """
+        self.timeout = 30
+        self._client: httpx.AsyncClient | None = None
+
+    async def __aenter__(self) -> "AsyncIntra":
+        self._client = build_async_client()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """
+        Closes the underlying async client.
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        The async client bound to the running event loop, created on first use.
+        """
+        if self._client is None:
+            self._client = build_async_client()
+        return self._client
+
+    async def access_token(self) -> str:
+        """
+        Retrieves the access token, see appcore.services.intra.tokens.
+        Only leaves the event loop when the in-process token is missing or expired.
+
+        Returns:
+            str: The access token.
+        """
+        if token := cached_access_token():
+            return token
+
+        return await sync_to_async(get_access_token, thread_sensitive=False)(self.BASE)
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Sends an authenticated request through the async client.
+        Waits for the shared rate limiter before each attempt, see appcore.services.intra.ratelimits.
+        Retries like Intra._request, see appcore.services.intra.retries.
+        Records endpoint, latency, status, retries and bytes, see appcore.services.intra.instruments.
+
+        Args:
+            method (str): The HTTP method.
+            url (str): The absolute URL.
+            **kwargs: Passed to httpx.AsyncClient.request.
+
+        Returns:
+            httpx.Response: The last response, status is not checked.
+
+        Raises:
+            httpx.TransportError: If the last attempt could not connect.
+        """
+        headers = {
+            "Authorization": f"Bearer {await self.access_token()}",
+            **kwargs.pop("headers", {}),
+        }
+        kwargs.setdefault("timeout", self.timeout)
+        attempts = settings.INTRA_API["RETRY_ATTEMPTS"]
+        timings = []
+
+        try:
+            for attempt in range(1, attempts + 1):
+                await aacquire()
+                started = monotonic()
+                try:
+                    r = await self.client.request(
+                        method, url, headers=headers, **kwargs
+                    )
+                except httpx.TransportError as e:
+                    timings.append(("error", monotonic() - started, 0))
+                    if not should_retry_error(method, e) or attempt == attempts:
+                        raise
+                    await asyncio.sleep(retry_delay(attempt))
+                    continue
+                timings.append((r.status_code, monotonic() - started, len(r.content)))
+                if not should_retry(method, r) or attempt == attempts:
+                    return r
+                await asyncio.sleep(retry_delay(attempt, r))
+
+            return r
+        finally:
+            await sync_to_async(record, thread_sensitive=False)(
+                method, url, timings, current_run()
+            )
+
+    async def _get_page(self, url: str, params: dict, pagenum: int, page_size: int):
+        """
+        Fetches one page of a list endpoint.
+
+        Returns:
+            httpx.Response: The response, status checked.
+        """
+        params = {**params, "page[number]": pagenum, "page[size]": page_size}
+        r = await self._request("GET", url, params=params)
+        r.raise_for_status()
+
+        return r
+
+    async def iter_pages(
+        self,
+        url: str,
+        params: dict = None,
+        page_size: int = None,
+        ordered: bool = False,
+    ) -> AsyncIterator[list]:
+        """
+        Yields the pages of a list endpoint as they arrive, see Intra.iter_pages.
+        Pages after the first are fetched concurrently, up to INTRA_API["PAGE_CONCURRENCY"].
+
+        Args:
+            url (str): The absolute URL of the list endpoint.
+            params (dict, optional): Extra query params such as filters.
+            page_size (int, optional): Items per page. Defaults to settings.INTRA_API["PAGE_SIZE"].
+            ordered (bool, optional): Yield in page order instead of arrival order. Defaults to False.
+
+        Yields:
+            list: The items of one page.
+        """
+        params = dict(params or {})
+        page_size = page_size or settings.INTRA_API["PAGE_SIZE"]
+        r = await self._get_page(url, params, 1, page_size)
+        page = r.json()
+        yield page
+        page_size, last_page = Intra._page_meta(r, page_size)
+        pagenum = 1
+
+        if last_page > 1:
+            semaphore = asyncio.Semaphore(settings.INTRA_API["PAGE_CONCURRENCY"])
+
+            async def _fetch(n):
+                async with semaphore:
+                    r = await self._get_page(url, params, n, page_size)
+                return r.json()
+
+            tasks = [asyncio.create_task(_fetch(n)) for n in range(2, last_page + 1)]
+            try:
+                for task in tasks if ordered else asyncio.as_completed(tasks):
+                    yield await task
+            finally:
+                # stops pending pages if the consumer is done early
+                for task in tasks:
+                    task.cancel()
+            page = tasks[-1].result()
+            pagenum = last_page
+
+        while len(page) >= page_size:
+            pagenum += 1
+            r = await self._get_page(url, params, pagenum, page_size)
+            page = r.json()
+            yield page
+
+    async def iter_items(
+        self, url: str, params: dict = None, **kwargs
+    ) -> AsyncIterator[dict]:
+        """
+        Yields the items of a list endpoint page by page as they arrive, see iter_pages.
+
+        Yields:
+            dict: One item.
+        """
+        async for page in self.iter_pages(url, params, **kwargs):
+            for item in page:
+                yield item
+
+    async def paginate(self, url: str, params: dict = None, page_size=None) -> list:
+        """
+        Fetches every item of a list endpoint, see iter_pages.
+
+        Returns:
+            list: The items of all pages, in page order.
+        """
+        return [
+            item
+            async for item in self.iter_items(
+                url, params, page_size=page_size, ordered=True
+            )
+        ]
+
+    async def user(self, login: str) -> dict:
+        """
+        Retrieves user information from the API.
+
+        Args:
+            login (str): The login of the user.
+
+        Returns:
+            dict: A dictionary containing the user information.
+        """
+        r = await self._request("GET", f"{self.BASE}/users/{login}")
+        r.raise_for_status()
+
+        return r.json()
+
+    async def get_user_info(self, id) -> dict:
+        """
+        Get user info by id or login
+        """
+        r = await self._request("GET", f"{self.BASE}/users/{id}")
+        r.raise_for_status()
+
+        return r.json()
+
+    async def users(self, filter_params: dict) -> list[dict]:
+        """
+        Filter users from the API, see Intra.users.
+        """
+        return await self.paginate(f"{self.BASE}/users", filter_params)
+
+    async def cursus_users(self, cursus_id: int, filter_params: dict) -> list[dict]:
+        """
+        Filter users of a cursus from the API, see Intra.cursus_users.
+        """
+        return await self.paginate(
+            f"{self.BASE}/cursus/{cursus_id}/users", filter_params
+        )
+
+    async def get_projects_by_cursus(self, cursus_id: int) -> list[dict]:
+        """
+        Get projects by cursus id.
+        """
+        return await self.paginate(f"{self.BASE}/cursus/{cursus_id}/projects")
+
+    async def get_correction_point_hist(
+        self, login: str, since: datetime = None
+    ) -> list:
+        """
+        /users/:user_id/correction_point_historics
+        Args:
+            login (str): The login of the user.
+            since (datetime, optional): Only entries created since then, inclusive. Defaults to the whole history.
+        Returns:
+            list: A list of correction point history.
+        """
+        params = {}
+        if since is not None:
+            params["range[created_at]"] = (
+                f"{since.isoformat()},{datetime.now(timezone.utc).isoformat()}"
+            )
+
+        return await self.paginate(
+            f"{self.BASE}/users/{login}/correction_point_historics", params
+        )
+
+    async def _gather(
+        self,
+        coro_fn: Callable[[Any], Awaitable],
+        args: Iterable | AsyncIterable,
+        concurrency: int | None,
+        on_result: Callable[[Any, Any], None] = None,
+    ) -> BulkFetchResult:
+        """
+        Runs coro_fn over args with at most `concurrency` calls in flight.
+        Calls start as args are produced, so they may come from a paginated listing.
+        A failing call does not stop the others, it is reported in the failures.
+        If args raises, or the gather is cancelled, the calls in flight are cancelled
+        before the error propagates, so none outlives the client.
+        Args:
+            on_result: Called with each arg and its result as soon as it is fetched.
+        Returns:
+            BulkFetchResult: The results keyed by arg in args order, duplicates fetched once.
+        """
+        semaphore = asyncio.Semaphore(concurrency or settings.INTRA_API["CONCURRENCY"])
+        tasks = {}
+
+        async def _bounded(arg):
+            async with semaphore:
+                ret = await coro_fn(arg)
+            if on_result is not None:
+                on_result(arg, ret)
+            return ret
+
+        async def _args():
+            if isinstance(args, AsyncIterable):
+                async for arg in args:
+                    yield arg
+            else:
+                for arg in args:
+                    yield arg
+
+        try:
+            async for arg in _args():
+                if arg not in tasks:
+                    tasks[arg] = asyncio.create_task(_bounded(arg))
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        ret = BulkFetchResult()
+        for arg, task in tasks.items():
+            if task.exception() is None:
+                ret.results[arg] = task.result()
+            else:
+                ret.failures[arg] = task.exception()
+
+        return ret
+
+    async def gather_users(
+        self,
+        logins: Iterable | AsyncIterable,
+        concurrency: int = None,
+        on_result: Callable[[Any, dict], None] = None,
+    ) -> BulkFetchResult:
+        """
+        Get user info for many ids or logins concurrently, see Intra.get_user_infos.
+
+        Args:
+            logins (Iterable | AsyncIterable): The ids or logins of the users, may be produced while fetching.
+            concurrency (int, optional): Requests in flight. Defaults to settings.INTRA_API["CONCURRENCY"].
+            on_result (Callable, optional): Called with each login and its user info as soon as it is fetched.
+
+        Returns:
+            BulkFetchResult: User infos keyed by login in request order, and the logins that failed.
+        """
+        return await self._gather(self.get_user_info, logins, concurrency, on_result)
+
+    async def gather_correction_point_hists(
+        self,
+        logins: Iterable[str],
+        concurrency: int = None,
+        since: dict[str, datetime | None] = None,
+    ) -> BulkFetchResult:
+        """
+        Get the correction point history of many users concurrently.
+
+        Args:
+            logins (Iterable[str]): The logins of the users.
+            concurrency (int, optional): Requests in flight. Defaults to settings.INTRA_API["CONCURRENCY"].
+            since (dict[str, datetime | None], optional): Only entries created since then, keyed by login.
+
+        Returns:
+            BulkFetchResult: The correction point history keyed by login, and the logins that failed.
+        """
+        since = since or {}
+
+        async def _fetch(login):
+            return await self.get_correction_point_hist(login, since.get(login))
+
+        return await self._gather(_fetch, logins, concurrency)
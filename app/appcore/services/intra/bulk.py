@@ -0,0 +1,38 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class BulkFetchResult:
+    """
+    Outcome of fetching many items by id, see Intra.get_user_infos.
+    results: fetched items keyed by id, in request order
+    failures: the last error of each id that could not be fetched
+    """
+
+    results: dict = field(default_factory=dict)
+    failures: dict[object, Exception] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        """
+        True if every id was fetched.
+        """
+        return not self.failures
+
+    def merge(self, other: "BulkFetchResult") -> "BulkFetchResult":
+        """
+        Folds a re-queue of the failures into this result.
+        Ids fetched by `other` are moved from failures to results.
+
+        Args:
+            other (BulkFetchResult): The result of fetching some of self.failures again.
+
+        Returns:
+            BulkFetchResult: self.
+        """
+        for id, item in other.results.items():
+            self.failures.pop(id, None)
+            self.results[id] = item
+        self.failures.update(other.failures)
+
+        return self
@@ -0,0 +1,110 @@
+"""
+Shared HTTP transport for the 42 Intra API.
+
+A single pooled keep-alive client is created lazily per process and reused by
+every Intra / IntraUser call, so requests stop paying a TCP+TLS handshake each.
+The client is dropped in forked children (celery prefork, hypercorn workers)
+since sockets must not be shared across processes.
+"""
+
+import os
+import threading
+
+import httpx
+from django.conf import settings
+
+_client: httpx.Client | None = None
+_client_pid: int | None = None
+_lock = threading.Lock()
+
+
+def _client_kwargs() -> dict:
+    """
+    Client options from settings.INTRA_API, shared by the sync and async clients.
+
+    Returns:
+        dict: kwargs for httpx.Client / httpx.AsyncClient.
+    """
+    conf = settings.INTRA_API
+    limits = httpx.Limits(
+        max_connections=conf["MAX_CONNECTIONS"],
+        max_keepalive_connections=conf["MAX_KEEPALIVE_CONNECTIONS"],
+        keepalive_expiry=conf["KEEPALIVE_EXPIRY"],
+    )
+
+    return {
+        "http2": conf["HTTP2"],
+        "limits": limits,
+        "timeout": conf["TIMEOUT"],
+    }
+
+
+def _build_client() -> httpx.Client:
+    """
+    Builds the pooled client from settings.INTRA_API.
+
+    Returns:
+        httpx.Client: The pooled client.
+    """
+    return httpx.Client(**_client_kwargs())
+
+
+def build_async_client() -> httpx.AsyncClient:
+    """
+    Builds a pooled async client from settings.INTRA_API.
+    Async clients are bound to an event loop, so the caller owns and closes it.
+
+    Returns:
+        httpx.AsyncClient: The pooled async client.
+    """
+    return httpx.AsyncClient(**_client_kwargs())
+
+
+def get_client() -> httpx.Client:
+    """
+    Returns the process-wide Intra client, creating it on first use.
+    Safe to call from multiple threads.
+
+    Returns:
+        httpx.Client: The pooled client.
+    """
+    global _client, _client_pid
+
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+
+    with _lock:
+        if _client is None or _client_pid != pid:
+            _client = _build_client()
+            _client_pid = pid
+
+    return _client
+
+
+def close_client() -> None:
+    """
+    Closes the process-wide client, if any. A new one is created on next use.
+    """
+    global _client, _client_pid
+
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+
+def _reset_after_fork() -> None:
+    """
+    Forgets the parent's client and lock in a forked child.
+    The parent's sockets are left untouched.
+    """
+    global _client, _client_pid, _lock
+
+    _client = None
+    _client_pid = None
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
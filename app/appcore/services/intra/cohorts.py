@@ -0,0 +1,159 @@
+"""
+Batch metrics over a cohort of Intra users.
+
+Computes total tries, evaluation points gained / lost and last active dates of
+many users at once: the user data is flattened in one pass, timestamps are
+parsed in bulk and the figures come out of a groupby each, instead of one
+DataFrame per user.
+Results are aligned with the given users, by position.
+
+Usage:
+    users = IntraUserSnapshot.bulk(datas)
+    df = cohort_metrics(users, cursus_id=21, eval_hists=eval_hists)
+"""
+
+from typing import TYPE_CHECKING, Sequence
+
+import pandas as pd
+
+if TYPE_CHECKING:
+    from appcore.services.intra.snapshot import IntraUserData
+
+EPOCH = pd.Timestamp("1970-01-01T00:00:00Z")
+EARNING_REASON = "Earning after defense"
+SPENDING_REASON = "Defense plannification"
+
+
+def _project_rows(users: Sequence["IntraUserData"], cursus_id: int) -> pd.DataFrame:
+    """
+    The project users of every user in the cursus, one row each.
+
+    Returns:
+        pd.DataFrame: owner (position in users), occurrence, updated_at (raw string).
+    """
+    owners, occurrences, updated_ats = [], [], []
+    for i, user in enumerate(users):
+        for pu in user.project_users(cursus_id):
+            owners.append(i)
+            occurrences.append(pu.get("occurrence"))
+            updated_ats.append(pu.get("updated_at"))
+
+    return pd.DataFrame(
+        {"owner": owners, "occurrence": occurrences, "updated_at": updated_ats}
+    )
+
+
+def total_tries(users: Sequence["IntraUserData"], cursus_id: int) -> pd.Series:
+    """
+    Total tries of each user in the cursus, a project tried n+1 times per occurrence n.
+
+    Returns:
+        pd.Series: Aligned with users, 0 for users without project in the cursus.
+    """
+    rows = _project_rows(users, cursus_id)
+    tries = pd.to_numeric(rows["occurrence"]) + 1
+
+    return (
+        tries.groupby(rows["owner"])
+        .sum()
+        .reindex(range(len(users)), fill_value=0)
+        .astype("int64")
+    )
+
+
+def last_active_dates(users: Sequence["IntraUserData"], cursus_id: int) -> pd.Series:
+    """
+    Latest project update of each user in the cursus.
+
+    Returns:
+        pd.Series: UTC timestamps aligned with users, EPOCH for users without project update.
+    """
+    rows = _project_rows(users, cursus_id)
+    updated_at = pd.to_datetime(
+        rows["updated_at"], utc=True, format="ISO8601", errors="coerce"
+    )
+    ret = updated_at.groupby(rows["owner"]).max().reindex(range(len(users)))
+
+    return ret.fillna(EPOCH)
+
+
+def days_inactive(
+    users: Sequence["IntraUserData"], cursus_id: int, now: pd.Timestamp = None
+) -> pd.Series:
+    """
+    Whole days since the last project update of each user in the cursus, see last_active_dates.
+
+    Returns:
+        pd.Series: Aligned with users.
+    """
+    now = now or pd.Timestamp.now(tz="UTC")
+
+    return (now - last_active_dates(users, cursus_id)).dt.days
+
+
+def eval_pts_gainloss(
+    users: Sequence["IntraUserData"], eval_hists: dict[str, list]
+) -> pd.DataFrame:
+    """
+    Evaluation points gained as evaluator and lost as evaluated by each user.
+
+    Args:
+        users (Sequence[IntraUserData]): The users.
+        eval_hists (dict[str, list]): Correction point history keyed by login, e.g. the results of AsyncIntra.gather_correction_point_hists.
+
+    Returns:
+        pd.DataFrame: pts_gain and pts_lost aligned with users, 0 without history.
+    """
+    owners, reasons, sums = [], [], []
+    for i, user in enumerate(users):
+        for hist in eval_hists.get(user.login) or []:
+            owners.append(i)
+            reasons.append(hist.get("reason"))
+            sums.append(hist.get("sum"))
+    rows = pd.DataFrame({"owner": owners, "reason": reasons, "sum": sums})
+    rows["sum"] = pd.to_numeric(rows["sum"])
+
+    def _total(reason):
+        matches = rows[rows["reason"] == reason]
+        return (
+            matches["sum"]
+            .groupby(matches["owner"])
+            .sum()
+            .reindex(range(len(users)), fill_value=0)
+            .astype("int64")
+        )
+
+    return pd.DataFrame(
+        {
+            "pts_gain": _total(EARNING_REASON),
+            "pts_lost": _total(SPENDING_REASON).abs(),
+        }
+    )
+
+
+def cohort_metrics(
+    users: Sequence["IntraUserData"],
+    cursus_id: int,
+    eval_hists: dict[str, list] = None,
+) -> pd.DataFrame:
+    """
+    Every batch metric of the cohort in the cursus.
+
+    Args:
+        users (Sequence[IntraUserData]): The users.
+        cursus_id (int): The cursus of the project based metrics.
+        eval_hists (dict[str, list], optional): Correction point history keyed by login. pts_gain / pts_lost are skipped without it.
+
+    Returns:
+        pd.DataFrame: inactive_for, total_tries, and pts_gain / pts_lost, aligned with users.
+    """
+    ret = pd.DataFrame(
+        {
+            "inactive_for": days_inactive(users, cursus_id),
+            "total_tries": total_tries(users, cursus_id),
+        }
+    )
+    if eval_hists is not None:
+        ret = ret.join(eval_pts_gainloss(users, eval_hists))
+
+    return ret
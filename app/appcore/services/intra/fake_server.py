@@ -0,0 +1,531 @@
+"""
+Local stand-in for the 42 Intra API, for benchmarks and offline development.
+
+Serves synthetic cadets of campus 33 with the endpoints the sync code uses:
+OAuth token, /users, /users/:id, /cursus/:id/users, /cursus/:id/cursus_users,
+/cursus/:id/projects, /projects_users, correction_point_historics and pools.
+Pagination follows the real API (page[number], page[size], X-Total, X-Per-Page).
+Latency and 429 responses can be injected to see how the client copes.
+
+Stdlib only, so it runs in its own process and does not skew client measurements.
+
+Usage:
+    python -m appcore.services.intra.fake_server --cadets 1000 --latency 0.05 --rate-429 0.01
+
+    with FakeIntraServer(cadets=1000) as server:
+        with patch.object(Intra, "BASE", server.base): ...
+"""
+
+import argparse
+import json
+import multiprocessing
+import random
+import threading
+import time
+from calendar import month_name
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from urllib.request import Request, urlopen
+
+CAMPUS_ID = 33
+CURSUS_SLUGS = {
+    3: "discovery-piscine",
+    9: "c-piscine",
+    21: "42cursus",
+    69: "python-for-data-science",
+    74: "cybersecurity",
+    75: "artificial-intelligence",
+}
+PROJECTS_PER_CURSUS = 20
+MAX_PAGE_SIZE = 100
+
+
+def _iso(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class FakeIntraData:
+    """
+    Deterministic synthetic cadets, generated from a seed.
+    Every 5th cadet is a pisciner of the current pool, the others are in 42cursus
+    with one or two side cursus. Correction point histories are generated on request.
+    """
+
+    def __init__(self, cadets: int, seed: int = 42, hist_size: int = 30):
+        self.seed = seed
+        self.hist_size = hist_size
+        self.pool_points = 0
+        self.lock = threading.Lock()
+        rng = random.Random(seed)
+        now = self.generated_at = datetime.now(timezone.utc)
+        self.projects = {
+            cursus_id: [
+                {
+                    "id": cursus_id * 1000 + i,
+                    "name": f"{slug} project {i:02d}",
+                    "slug": f"{slug}-project-{i:02d}",
+                }
+                for i in range(PROJECTS_PER_CURSUS)
+            ]
+            for cursus_id, slug in CURSUS_SLUGS.items()
+        }
+        self.users = {}
+        self.logins = {}
+        for i in range(cadets):
+            user = self._make_user(i, rng, now)
+            self.users[user["id"]] = user
+            self.logins[user["login"]] = user
+
+    def _make_user(self, i: int, rng: random.Random, now: datetime) -> dict:
+        id = 100000 + i
+        login = f"cadet{i:05d}"
+        pisciner = i % 5 == 0
+        if pisciner:
+            cursus_ids = [9]
+            pool = now
+        else:
+            cursus_ids = [9, 21] + rng.sample([3, 69, 74, 75], rng.randint(0, 2))
+            pool = now - timedelta(days=rng.randint(120, 1500))
+        cursus_users = []
+        projects_users = []
+        for cursus_id in cursus_ids:
+            blackholed_at = None
+            if cursus_id == 21:
+                blackholed_at = _iso(now + timedelta(days=rng.randint(-200, 300)))
+            cursus_users.append(
+                {
+                    "id": id * 100 + cursus_id,
+                    "cursus_id": cursus_id,
+                    "cursus": {
+                        "id": cursus_id,
+                        "name": CURSUS_SLUGS[cursus_id],
+                        "slug": CURSUS_SLUGS[cursus_id],
+                    },
+                    "level": round(rng.uniform(0, 21), 2),
+                    "grade": "Learner" if cursus_id == 21 else None,
+                    "begin_at": _iso(pool),
+                    "end_at": None,
+                    "blackholed_at": blackholed_at,
+                    "updated_at": _iso(now - timedelta(days=rng.randint(0, 60))),
+                }
+            )
+            for project in rng.sample(
+                self.projects[cursus_id], rng.randint(0, PROJECTS_PER_CURSUS)
+            ):
+                final_mark = rng.choice([None, 0, 80, 100, 100, 125])
+                projects_users.append(
+                    {
+                        "id": id * 1000 + len(projects_users),
+                        "occurrence": rng.randint(0, 3),
+                        "final_mark": final_mark,
+                        "status": "in_progress" if final_mark is None else "finished",
+                        "validated?": None if final_mark is None else final_mark >= 80,
+                        "project": project,
+                        "cursus_ids": [cursus_id],
+                        "updated_at": _iso(now - timedelta(days=rng.randint(0, 400))),
+                    }
+                )
+
+        return {
+            "id": id,
+            "login": login,
+            "email": f"{login}@student.42bangkok.com",
+            "first_name": f"First{i}",
+            "last_name": f"Last{i}",
+            "correction_point": rng.randint(0, 30),
+            "wallet": rng.randint(0, 500),
+            "staff?": False,
+            "pool_month": month_name[pool.month].lower(),
+            "pool_year": str(pool.year),
+            "updated_at": _iso(now - timedelta(minutes=rng.randint(0, 60 * 24 * 30))),
+            "campus_users": [{"campus_id": CAMPUS_ID, "is_primary": True}],
+            "cursus_users": cursus_users,
+            "projects_users": projects_users,
+        }
+
+    @staticmethod
+    def short(user: dict) -> dict:
+        """
+        The user as embedded in list endpoints.
+        """
+        return {
+            k: v
+            for k, v in user.items()
+            if k not in ("cursus_users", "projects_users", "campus_users")
+        }
+
+    def get(self, id_or_login: str) -> dict | None:
+        if id_or_login.isdigit():
+            return self.users.get(int(id_or_login))
+        return self.logins.get(id_or_login)
+
+    def cursus_users(self, cursus_id: int) -> list[dict]:
+        return [
+            {**cursus_user, "user": self.short(user)}
+            for user in self.users.values()
+            for cursus_user in user["cursus_users"]
+            if cursus_user["cursus_id"] == cursus_id
+        ]
+
+    def projects_users(self, cursus_id: int | None) -> list[dict]:
+        return [
+            {**project_user, "user": self.short(user)}
+            for user in self.users.values()
+            for project_user in user["projects_users"]
+            if cursus_id is None or cursus_id in project_user["cursus_ids"]
+        ]
+
+    def correction_point_historics(self, user: dict) -> list[dict]:
+        rng = random.Random(self.seed * 1_000_003 + user["id"])
+        now = self.generated_at
+        entries = [
+            rng.choice([("Earning after defense", 1), ("Defense plannification", -1)])
+            for _ in range(self.hist_size)
+        ]
+        # ends on the current correction points, like the real ledger
+        total = user["correction_point"] - sum(s for _, s in entries)
+        ret = []
+        for i, (reason, points) in enumerate(entries):
+            total += points
+            ret.append(
+                {
+                    "id": user["id"] * 1000 + i,
+                    "scale_team_id": user["id"] * 1000 + i,
+                    "reason": reason,
+                    "sum": points,
+                    "total": total,
+                    "created_at": _iso(now - timedelta(hours=self.hist_size - i)),
+                    "updated_at": _iso(now - timedelta(hours=self.hist_size - i)),
+                }
+            )
+
+        return ret
+
+
+def _in_range(item: dict, params: dict) -> bool:
+    """
+    Applies the filter[login] and range[<date field>] query params.
+    """
+    user = item.get("user", item)
+    if "filter[login]" in params and user["login"] not in params["filter[login]"].split(
+        ","
+    ):
+        return False
+    for key, value in params.items():
+        if not key.startswith("range["):
+            continue
+        start, end = (
+            datetime.fromisoformat(v.replace("Z", "+00:00")) for v in value.split(",")
+        )
+        field = datetime.fromisoformat(item[key[6:-1]].replace("Z", "+00:00"))
+        if not start <= field <= end:
+            return False
+
+    return True
+
+
+class FakeIntraHandler(BaseHTTPRequestHandler):
+    """
+    Routes requests to FakeIntraData. Configured through the server attributes.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body=None, headers: dict = None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, str(v))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_page(self, items: list, params: dict):
+        items = [item for item in items if _in_range(item, params)]
+        page_size = min(int(params.get("page[size]", 30)), MAX_PAGE_SIZE)
+        pagenum = int(params.get("page[number]", 1))
+        start = (pagenum - 1) * page_size
+        self._send(
+            200,
+            items[start : start + page_size],
+            {"X-Total": len(items), "X-Per-Page": page_size, "X-Page": pagenum},
+        )
+
+    def _throttle(self) -> bool:
+        """
+        Injects latency and 429s. Returns True if the request was answered with a 429.
+        """
+        server = self.server
+        with server.stats_lock:
+            server.stats["requests"] += 1
+            throttled = server.rng.random() < server.rate_429
+            if throttled:
+                server.stats["throttled"] += 1
+        if server.latency:
+            time.sleep(server.latency)
+        if throttled:
+            self._send(
+                429, {"error": "Too Many Requests"}, {"Retry-After": server.retry_after}
+            )
+
+        return throttled
+
+    def _handle(self, method: str):
+        url = urlsplit(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if (
+            method == "POST"
+            and body
+            and "json" not in self.headers.get("Content-Type", "")
+        ):
+            params.update({k: v[-1] for k, v in parse_qs(body.decode()).items()})
+        segments = url.path.strip("/").split("/")
+        if segments[0] == "_stats":
+            return self._stats(method)
+        if segments[0] == "_reset" and method == "POST":
+            return self._reset()
+        if segments[0] != "v2":
+            return self._send(404, {"error": "Not Found"})
+        segments = segments[1:]
+        if self._throttle():
+            return
+
+        data = self.server.data
+        match method, segments:
+            case "POST", ["oauth", "token"]:
+                self._send(
+                    200,
+                    {
+                        "access_token": "fake-intra-token",
+                        "token_type": "bearer",
+                        "expires_in": 7200,
+                    },
+                )
+            case _ if not self.headers.get("Authorization", "").startswith("Bearer "):
+                self._send(401, {"error": "Not authorized"})
+            case "GET", ["users"]:
+                self._send_page([data.short(u) for u in data.users.values()], params)
+            case "GET", ["users", id]:
+                user = data.get(id)
+                if user is None:
+                    return self._send(404, {})
+                self._send(200, user)
+            case "PATCH", ["users", id]:
+                user = data.get(id)
+                if user is None:
+                    return self._send(404, {})
+                user["email"] = json.loads(body)["user"]["email"]
+                self._send(204)
+            case "GET", ["users", id, "correction_point_historics"]:
+                user = data.get(id)
+                if user is None:
+                    return self._send(404, {})
+                self._send_page(data.correction_point_historics(user), params)
+            case "POST", ["users", id, "correction_points", "add"]:
+                user = data.get(id)
+                if user is None:
+                    return self._send(404, {})
+                with data.lock:
+                    user["correction_point"] += int(params.get("amount", 0))
+                self._send(200, data.short(user))
+            case "GET", ["cursus", cursus_id, "users"]:
+                users = [
+                    data.short(cursus_user["user"])
+                    for cursus_user in data.cursus_users(int(cursus_id))
+                ]
+                self._send_page(users, params)
+            case "GET", ["cursus", cursus_id, "cursus_users"]:
+                self._send_page(data.cursus_users(int(cursus_id)), params)
+            case "GET", ["cursus", cursus_id, "projects"]:
+                self._send_page(data.projects.get(int(cursus_id), []), params)
+            case "GET", ["projects_users"]:
+                cursus_id = params.get("filter[cursus]")
+                self._send_page(
+                    data.projects_users(int(cursus_id) if cursus_id else None), params
+                )
+            case "GET", ["pools", pool_id]:
+                self._send(
+                    200,
+                    {"id": int(pool_id), "current_points": data.pool_points},
+                )
+            case "POST", ["pools", pool_id, "points", "add"]:
+                with data.lock:
+                    data.pool_points += int(params.get("points", 0))
+                self._send(
+                    200, {"id": int(pool_id), "current_points": data.pool_points}
+                )
+            case _:
+                self._send(404, {"error": "Not Found"})
+
+    def _stats(self, method: str):
+        """
+        GET /_stats returns the request counters.
+        """
+        with self.server.stats_lock:
+            self._send(200, dict(self.server.stats))
+
+    def _reset(self):
+        """
+        POST /_reset regenerates the cadets and zeroes the counters,
+        undoing the writes of a previous run (correction points, pool, emails).
+        """
+        server = self.server
+        with server.stats_lock:
+            data = server.data
+            server.data = FakeIntraData(
+                len(data.users), seed=data.seed, hist_size=data.hist_size
+            )
+            server.rng = random.Random(data.seed)
+            server.stats.update(requests=0, throttled=0)
+        self._send(204)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+
+def make_server(
+    port: int = 0,
+    cadets: int = 500,
+    latency: float = 0,
+    rate_429: float = 0,
+    retry_after: float = 1,
+    hist_size: int = 30,
+    seed: int = 42,
+) -> ThreadingHTTPServer:
+    """
+    Builds the fake Intra server, not started.
+
+    Args:
+        port (int, optional): 0 picks a free port.
+        cadets (int, optional): Number of synthetic cadets.
+        latency (float, optional): Seconds added to every response.
+        rate_429 (float, optional): Share of requests answered with a 429, from 0 to 1.
+        retry_after (float, optional): Retry-After of the injected 429s, in seconds.
+        hist_size (int, optional): Correction point history entries per cadet.
+        seed (int, optional): Seed of the synthetic data and of the 429 injection.
+
+    Returns:
+        ThreadingHTTPServer: The server, serve_forever() to start it.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeIntraHandler)
+    server.daemon_threads = True
+    server.data = FakeIntraData(cadets, seed=seed, hist_size=hist_size)
+    server.latency = latency
+    server.rate_429 = rate_429
+    server.retry_after = retry_after
+    server.rng = random.Random(seed)
+    server.stats = {"requests": 0, "throttled": 0}
+    server.stats_lock = threading.Lock()
+
+    return server
+
+
+def _serve(conn, kwargs: dict):
+    server = make_server(**kwargs)
+    conn.send(server.server_address[1])
+    conn.close()
+    server.serve_forever()
+
+
+class FakeIntraServer:
+    """
+    Runs the fake Intra server in a child process.
+
+    Usage:
+        with FakeIntraServer(cadets=1000, latency=0.05) as server:
+            server.base  # http://127.0.0.1:<port>/v2
+            server.stats()  # {"requests": ..., "throttled": ...}
+            server.reset()  # back to the initial cadets
+    """
+
+    def __init__(self, **kwargs):
+        """
+        Args:
+            **kwargs: Passed to make_server.
+        """
+        self.kwargs = kwargs
+        self.process: multiprocessing.Process | None = None
+        self.port: int | None = None
+
+    @property
+    def base(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v2"
+
+    def start(self) -> "FakeIntraServer":
+        # spawn, so the child does not inherit Django state, sockets or locks
+        ctx = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_serve, args=(child_conn, self.kwargs), daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        try:
+            self.port = parent_conn.recv()
+        except EOFError:
+            self.process.join()
+            raise RuntimeError(
+                f"Fake Intra server exited with code {self.process.exitcode}"
+            )
+        finally:
+            parent_conn.close()
+
+        return self
+
+    def stop(self) -> None:
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+            self.process = None
+
+    def stats(self) -> dict:
+        """
+        The request counters of the server.
+
+        Returns:
+            dict: requests and throttled (429) counts.
+        """
+        with urlopen(f"http://127.0.0.1:{self.port}/_stats") as r:
+            return json.loads(r.read())
+
+    def reset(self) -> None:
+        """
+        Restores the initial cadets and zeroes the counters, so runs are comparable.
+        """
+        url = f"http://127.0.0.1:{self.port}/_reset"
+        with urlopen(Request(url, method="POST")):
+            pass
+
+    def __enter__(self) -> "FakeIntraServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--port", type=int, default=8042)
+    parser.add_argument("--cadets", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--rate-429", type=float, default=0)
+    parser.add_argument("--retry-after", type=float, default=1)
+    parser.add_argument("--hist-size", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    server = make_server(**vars(args))
+    print(f"Fake Intra API on http://127.0.0.1:{server.server_address[1]}/v2")
+    server.serve_forever()
@@ -0,0 +1,272 @@
+"""
+Per-endpoint instrumentation of Intra API traffic.
+
+Every Intra / AsyncIntra request records its endpoint template, latency, status,
+retries and bytes into Redis counters, grouped by run: the Celery task run it
+happens in, or a named block wrapped in `intra_run(...)`, or "adhoc".
+A run is only listed once it made a request.
+
+Redis layout, every key expires after RUN_TTL:
+    intraapi:metrics:runs                 sorted set of run ids by start time, trimmed on write
+    intraapi:metrics:run:{run_id}:meta    hash of name, started, finished
+    intraapi:metrics:run:{run_id}         hash of "{method} {endpoint}|{metric}" counters
+"""
+
+import contextvars
+import logging
+import re
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from celery.signals import task_postrun, task_prerun
+from django.conf import settings
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "intraapi:metrics"
+RUNS_KEY = f"{KEY_PREFIX}:runs"
+RUN_TTL = 7 * 24 * 3600
+ADHOC_RUN = "adhoc"
+# upper bounds of the latency histogram buckets, in ms
+LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+_run: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "intra_run", default=ADHOC_RUN
+)
+# name and start time of the runs started in this process, by run id
+_run_meta: dict[str, tuple[str, float]] = {}
+
+
+def endpoint_template(url: str) -> str:
+    """
+    Turns a request URL into its endpoint template.
+
+    Example:
+        >>> endpoint_template("https://api.intra.42.fr/v2/users/jdoe/correction_point_historics")
+        '/users/:id/correction_point_historics'
+    """
+    segments = urlsplit(url).path.strip("/").split("/")
+    if segments and re.fullmatch(r"v\d+", segments[0]):
+        segments = segments[1:]
+    ret = []
+    for i, segment in enumerate(segments):
+        if segment.isdigit() or (i > 0 and segments[i - 1] == "users"):
+            segment = ":id"
+        ret.append(segment)
+
+    return "/" + "/".join(ret)
+
+
+def _run_key(run_id: str) -> str:
+    return f"{KEY_PREFIX}:run:{run_id}"
+
+
+def current_run() -> str:
+    """
+    The id of the run requests are recorded under.
+    """
+    return _run.get()
+
+
+def start_run(run_id: str, name: str) -> contextvars.Token:
+    """
+    Starts recording requests under `run_id`.
+    Nothing is written until the first request, see record.
+
+    Returns:
+        contextvars.Token: To pass to end_run.
+    """
+    _run_meta[run_id] = (name, time.time())
+
+    return _run.set(run_id)
+
+
+def end_run(token: contextvars.Token) -> None:
+    """
+    Stops recording under the current run, see start_run.
+    """
+    run_id = _run.get()
+    _run.reset(token)
+    _run_meta.pop(run_id, None)
+    try:
+        conn = get_redis_connection("default")
+        if conn.exists(f"{_run_key(run_id)}:meta"):
+            conn.hset(f"{_run_key(run_id)}:meta", "finished", time.time())
+    except Exception as e:
+        logger.warning(f"Could not end intra metrics run {run_id}: {e!r}")
+
+
+@contextmanager
+def intra_run(name: str):
+    """
+    Records the Intra requests made inside the block under a new run.
+    Celery tasks get one automatically.
+
+    Usage:
+        with intra_run("manual:update_intraprofile"):
+            update_intraprofile()
+    """
+    token = start_run(f"{name}:{int(time.time())}", name)
+    try:
+        yield
+    finally:
+        end_run(token)
+
+
+def record(
+    method: str,
+    url: str,
+    attempts: list[tuple[int | str, float, int]],
+    run_id: str = None,
+) -> None:
+    """
+    Records one logical request, retries included, and lists its run. Never raises.
+
+    Args:
+        method (str): The HTTP method.
+        url (str): The request URL.
+        attempts (list[tuple[int | str, float, int]]): (status or "error", latency in seconds, bytes) of each attempt.
+        run_id (str, optional): Defaults to the current run.
+    """
+    if not settings.INTRA_API["METRICS"] or not attempts:
+        return
+    run_id = run_id or current_run()
+    prefix = f"{method} {endpoint_template(url)}"
+    key = _run_key(run_id)
+    now = time.time()
+    try:
+        pipe = get_redis_connection("default").pipeline(transaction=False)
+        pipe.hincrby(key, f"{prefix}|requests", 1)
+        pipe.hincrby(key, f"{prefix}|retries", len(attempts) - 1)
+        for status, latency, nbytes in attempts:
+            latency_ms = latency * 1000
+            bucket = next((le for le in LATENCY_BUCKETS_MS if latency_ms <= le), "inf")
+            pipe.hincrby(key, f"{prefix}|status:{status}", 1)
+            pipe.hincrby(key, f"{prefix}|bytes", nbytes)
+            pipe.hincrbyfloat(key, f"{prefix}|latency_ms_sum", latency_ms)
+            pipe.hincrby(key, f"{prefix}|latency_ms_le:{bucket}", 1)
+        pipe.expire(key, RUN_TTL)
+        if run_id in _run_meta:
+            name, started = _run_meta[run_id]
+            pipe.zadd(RUNS_KEY, {run_id: started})
+            pipe.hset(f"{key}:meta", mapping={"name": name, "started": started})
+            pipe.expire(f"{key}:meta", RUN_TTL)
+        else:
+            pipe.zadd(RUNS_KEY, {run_id: now})
+        pipe.zremrangebyscore(RUNS_KEY, 0, now - RUN_TTL)
+        pipe.expire(RUNS_KEY, RUN_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not record intra metrics: {e!r}")
+
+
+def _parse_endpoints(raw: dict) -> dict:
+    """
+    Folds the flat run hash into per-endpoint figures.
+    """
+    ret = {}
+    for field, value in raw.items():
+        endpoint, metric = field.decode().rsplit("|", 1)
+        figures = ret.setdefault(
+            endpoint,
+            {
+                "requests": 0,
+                "retries": 0,
+                "bytes": 0,
+                "statuses": {},
+                "latency_ms_sum": 0.0,
+                "latency_ms_buckets": {},
+            },
+        )
+        if metric.startswith("status:"):
+            figures["statuses"][metric.removeprefix("status:")] = int(value)
+        elif metric.startswith("latency_ms_le:"):
+            figures["latency_ms_buckets"][metric.removeprefix("latency_ms_le:")] = int(
+                value
+            )
+        elif metric == "latency_ms_sum":
+            figures["latency_ms_sum"] = float(value)
+        else:
+            figures[metric] = int(value)
+
+    for figures in ret.values():
+        attempts = sum(figures["statuses"].values())
+        figures["latency_ms_avg"] = (
+            figures["latency_ms_sum"] / attempts if attempts else 0.0
+        )
+
+    return ret
+
+
+def list_runs(limit: int = 50) -> list[dict]:
+    """
+    The most recent runs, latest first, expired ones left out.
+
+    Returns:
+        list[dict]: id, name, started, finished, of each run.
+    """
+    conn = get_redis_connection("default")
+    ret = []
+    for run_id in conn.zrevrangebyscore(
+        RUNS_KEY, "+inf", time.time() - RUN_TTL, start=0, num=limit
+    ):
+        run_id = run_id.decode()
+        meta = {
+            k.decode(): v.decode()
+            for k, v in conn.hgetall(f"{_run_key(run_id)}:meta").items()
+        }
+        ret.append(
+            {
+                "id": run_id,
+                "name": meta.get("name", run_id),
+                "started": float(meta["started"]) if "started" in meta else None,
+                "finished": float(meta["finished"]) if "finished" in meta else None,
+            }
+        )
+
+    return ret
+
+
+def read_run(run_id: str) -> dict | None:
+    """
+    The figures of one run, per endpoint.
+
+    Returns:
+        dict | None: None if the run is unknown or expired.
+    """
+    conn = get_redis_connection("default")
+    raw = conn.hgetall(_run_key(run_id))
+    meta = {
+        k.decode(): v.decode()
+        for k, v in conn.hgetall(f"{_run_key(run_id)}:meta").items()
+    }
+    if not raw and not meta:
+        return None
+    endpoints = _parse_endpoints(raw)
+
+    return {
+        "id": run_id,
+        "name": meta.get("name", run_id),
+        "started": float(meta["started"]) if "started" in meta else None,
+        "finished": float(meta["finished"]) if "finished" in meta else None,
+        "requests": sum(e["requests"] for e in endpoints.values()),
+        "retries": sum(e["retries"] for e in endpoints.values()),
+        "bytes": sum(e["bytes"] for e in endpoints.values()),
+        "endpoints": endpoints,
+    }
+
+
+_task_tokens: dict[str, contextvars.Token] = {}
+
+
+@task_prerun.connect
+def _on_task_prerun(task_id=None, task=None, **kwargs):
+    _task_tokens[task_id] = start_run(f"{task.name}:{task_id}", task.name)
+
+
+@task_postrun.connect
+def _on_task_postrun(task_id=None, **kwargs):
+    if (token := _task_tokens.pop(task_id, None)) is not None:
+        end_run(token)
@@ -1,12 +1,29 @@
-import threading
-from time import sleep
-from urllib.parse import urlencode
+import math
+from concurrent.futures import (
+    ALL_COMPLETED,
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from contextvars import copy_context
+from time import monotonic, sleep
+from typing import Iterable, Iterator
 import httpx
-from appcore.services.env_manager import ENVS
-from django.core.cache import cache
+from appcore.services.intra.bulk import BulkFetchResult
+from appcore.services.intra.clients import get_client
+from appcore.services.intra.instruments import record
+from appcore.services.intra.ratelimits import acquire
+from appcore.services.intra.tokens import get_access_token
+from appcore.services.intra.retries import (
+    is_transient,
+    retry_delay,
+    should_retry,
+    should_retry_error,
+)
+from django.conf import settings
 from pydantic import validate_call
 from appcore.services.console import console
-from rich.progress import track
 
 
 class Intra:
@@ -26,7 +43,7 @@ class Intra:
     @property
     def access_token(self) -> str:
         """
-        Retrieves the access token for the Intra API. If the token is cached, it will be returned.
+        Retrieves the access token for the Intra API, see appcore.services.intra.tokens.
 
         Returns:
             str: The access token.
@@ -34,30 +51,156 @@ class Intra:
         Raises:
             Exception: If the token cannot be fetched.
         """
-        token = cache.get("intraapi:access-token")
-        if token is not None:
-            return token
-
-        data = {"grant_type": "client_credentials"}
-        auth = (ENVS["FORTY_TWO_CLIENT_ID"], ENVS["FORTY_TWO_CLIENT_SECRET"])
-        url = f"{self.BASE}/oauth/token"
-        with httpx.Client(timeout=self.timeout) as client:
-            r = client.post(
-                url,
-                data=data,
-                auth=auth,
-            )
-            r.raise_for_status()
-
-        access_token = r.json()["access_token"]
-        ttl = r.json()["expires_in"] - 60
-        cache.set(
-            "intraapi:access-token",
-            access_token,
-            ttl,
-        )
-
-        return r.json()["access_token"]
+        return get_access_token(self.BASE)
+
+    def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Sends an authenticated request through the shared pooled client.
+        Waits for the shared rate limiter before each attempt, see appcore.services.intra.ratelimits.
+        Retries 429, 5xx and connection errors, see appcore.services.intra.retries.
+        Records endpoint, latency, status, retries and bytes, see appcore.services.intra.instruments.
+
+        Args:
+            method (str): The HTTP method.
+            url (str): The absolute URL.
+            **kwargs: Passed to httpx.Client.request.
+
+        Returns:
+            httpx.Response: The last response, status is not checked.
+
+        Raises:
+            httpx.TransportError: If the last attempt could not connect.
+        """
+        headers = {
+            "Authorization": f"Bearer {self.access_token}",
+            **kwargs.pop("headers", {}),
+        }
+        kwargs.setdefault("timeout", self.timeout)
+        attempts = settings.INTRA_API["RETRY_ATTEMPTS"]
+        timings = []
+
+        try:
+            for attempt in range(1, attempts + 1):
+                acquire()
+                started = monotonic()
+                try:
+                    r = get_client().request(method, url, headers=headers, **kwargs)
+                except httpx.TransportError as e:
+                    timings.append(("error", monotonic() - started, 0))
+                    if not should_retry_error(method, e) or attempt == attempts:
+                        raise
+                    console.log(f"{method} {url} {e!r}, retrying {attempt=}")
+                    sleep(retry_delay(attempt))
+                    continue
+                timings.append((r.status_code, monotonic() - started, len(r.content)))
+                if not should_retry(method, r) or attempt == attempts:
+                    return r
+                console.log(f"{method} {url} {r.status_code}, retrying {attempt=}")
+                sleep(retry_delay(attempt, r))
+
+            return r
+        finally:
+            record(method, url, timings)
+
+    def _get_page(self, url: str, params: dict, pagenum: int, page_size: int):
+        """
+        Fetches one page of a list endpoint.
+
+        Returns:
+            httpx.Response: The response, status checked.
+        """
+        params = {**params, "page[number]": pagenum, "page[size]": page_size}
+        r = self._request("GET", url, params=params)
+        r.raise_for_status()
+
+        return r
+
+    @staticmethod
+    def _page_meta(r: httpx.Response, page_size: int) -> tuple[int, int]:
+        """
+        Reads the page size and page count from the X-Per-Page / X-Total headers.
+
+        Returns:
+            tuple[int, int]: The page size and the last page number, 1 if unknown.
+        """
+        try:
+            page_size = int(r.headers["X-Per-Page"])
+            return page_size, math.ceil(int(r.headers["X-Total"]) / page_size)
+        except (KeyError, ValueError, ZeroDivisionError):
+            return page_size, 1
+
+    def iter_pages(
+        self,
+        url: str,
+        params: dict = None,
+        page_size: int = None,
+        ordered: bool = False,
+    ) -> Iterator[list]:
+        """
+        Yields the pages of a list endpoint as they arrive.
+        The page count is read from the X-Total / X-Per-Page headers of the first page
+        and the remaining pages are fetched concurrently, paced by the rate limiter.
+        Walks on page by page when the headers are missing or the total has grown.
+
+        Args:
+            url (str): The absolute URL of the list endpoint.
+            params (dict, optional): Extra query params such as filters.
+            page_size (int, optional): Items per page. Defaults to settings.INTRA_API["PAGE_SIZE"], the API maximum.
+            ordered (bool, optional): Yield in page order instead of arrival order. Defaults to False.
+
+        Yields:
+            list: The items of one page.
+        """
+        params = dict(params or {})
+        page_size = page_size or settings.INTRA_API["PAGE_SIZE"]
+        r = self._get_page(url, params, 1, page_size)
+        page = r.json()
+        yield page
+        page_size, last_page = self._page_meta(r, page_size)
+        pagenum = 1
+
+        if last_page > 1:
+            pool = ThreadPoolExecutor(settings.INTRA_API["PAGE_CONCURRENCY"])
+            try:
+                futures = [
+                    pool.submit(
+                        copy_context().run,
+                        lambda n: self._get_page(url, params, n, page_size),
+                        n,
+                    )
+                    for n in range(2, last_page + 1)
+                ]
+                for future in futures if ordered else as_completed(futures):
+                    yield future.result().json()
+            finally:
+                # stops pending pages if the consumer is done early
+                pool.shutdown(cancel_futures=True)
+            page = futures[-1].result().json()
+            pagenum = last_page
+
+        while len(page) >= page_size:
+            pagenum += 1
+            page = self._get_page(url, params, pagenum, page_size).json()
+            yield page
+
+    def iter_items(self, url: str, params: dict = None, **kwargs) -> Iterator[dict]:
+        """
+        Yields the items of a list endpoint page by page as they arrive, see iter_pages.
+
+        Yields:
+            dict: One item.
+        """
+        for page in self.iter_pages(url, params, **kwargs):
+            yield from page
+
+    def _paginate(self, url: str, params: dict = None, page_size: int = None) -> list:
+        """
+        Fetches every item of a list endpoint, see iter_pages.
+
+        Returns:
+            list: The items of all pages, in page order.
+        """
+        return list(self.iter_items(url, params, page_size=page_size, ordered=True))
 
     @validate_call
     def user(self, login: str) -> dict:
@@ -71,10 +214,8 @@ class Intra:
             dict: A dictionary containing the user information.
         """
         url = f"{self.BASE}/users/{login}"
-        headers = {"Authorization": f"Bearer {self.access_token}"}
-        with httpx.Client(timeout=self.timeout) as client:
-            r = client.get(url, headers=headers)
-            r.raise_for_status()
+        r = self._request("GET", url)
+        r.raise_for_status()
 
         return r.json()
 
@@ -96,31 +237,9 @@ class Intra:
         Raises:
             Exception: If the users cannot be fetched.
         """
-        page = 1
-        count = 1
-        ret = []
-        filter_params.update(
-            {
-                "per_page": per_page,
-                "page": page,
-            }
-        )
         url = f"{self.BASE}/users"
-        headers = {"Authorization": f"Bearer {self.access_token}"}
-        with httpx.Client(timeout=self.timeout) as client:
-            r = client.get(url, headers=headers, params=filter_params)
-            r.raise_for_status()
-            ret += r.json()
-
-            while count > 0:
-                count = len(r.json())
-                page += 1
-                filter_params.update({"page": page})
-                r = client.get(url, headers=headers, params=filter_params)
-                r.raise_for_status()
-                ret += r.json()
 
-        return ret
+        return self._paginate(url, filter_params, per_page)
 
     @validate_call
     def cursus_users(
@@ -129,33 +248,9 @@ class Intra:
         filter_params: dict,
         per_page: int = 100,
     ) -> list:
-        page = 1
-        count = 1
-        ret = []
-        filter_params.update(
-            {
-                "per_page": per_page,
-                "page": page,
-            }
-        )
         url = f"{self.BASE}/cursus/{cursus_id}/users/"
-        headers = {"Authorization": f"Bearer {self.access_token}"}
-        with httpx.Client(timeout=self.timeout) as client:
-            r = client.get(
-                url, headers=headers, params=filter_params, timeout=self.timeout
-            )
-            r.raise_for_status()
-            ret += r.json()
-
-            while count > 0:
-                count = len(r.json())
-                page += 1
-                filter_params.update({"page": page})
-                r = client.get(url, headers=headers, params=filter_params)
-                r.raise_for_status()
-                ret += r.json()
 
-        return ret
+        return self._paginate(url, filter_params, per_page)
 
     @validate_call
     def pools(self, pool_id: int = 73) -> dict:
@@ -176,11 +271,9 @@ class Intra:
         Raises:
             Exception: If the pool cannot be fetched.
         """
-        headers = {"Authorization": f"Bearer {self.access_token}"}
         url = f"{self.BASE}/pools/{pool_id}"
-        with httpx.Client(timeout=self.timeout) as client:
-            r = client.get(url, headers=headers)
-            r.raise_for_status()
+        r = self._request("GET", url)
+        r.raise_for_status()
 
         return r.json()
 
@@ -205,12 +298,10 @@ class Intra:
         Raises:
             Exception: If failed to add points to pool.
         """
-        headers = {"Authorization": f"Bearer {self.access_token}"}
         url = f"{self.BASE}/pools/{pool_id}/points/add"
         data = {"points": value}
-        with httpx.Client(timeout=self.timeout) as client:
-            r = client.post(url, headers=headers, data=data, timeout=self.timeout)
-            r.raise_for_status()
+        r = self._request("POST", url, data=data)
+        r.raise_for_status()
 
         return r.json()
 
@@ -227,23 +318,18 @@ class Intra:
         }
         """
         ENDPOINT = "cursus"
-        params = urlencode(filter)
+        url = f"{self.BASE}/{ENDPOINT}/{cursus_id}/users/"
+        console.log(f"Getting {url} {filter}")
 
-        def _get_users_at_page(pagenum):
-            url = f"{self.BASE}/{ENDPOINT}/{cursus_id}/users/?{params}&page[number]={pagenum}&page[size]=50"
-            console.log(f"Getting {url}")
-            headers = {"Authorization": f"Bearer {self.access_token}"}
-            r = httpx.get(url, headers=headers, timeout=self.timeout)
-            r.raise_for_status()
-            return r.json()
+        return self._paginate(url, filter)
 
-        l_users = []
-        pagenum = 1
-        while r := _get_users_at_page(pagenum):
-            l_users += r
-            pagenum += 1
+    def iter_users_by_cursus_id(self, cursus_id: int, filter: dict) -> Iterator[dict]:
+        """
+        Yields the users of a cursus page by page as they arrive, see get_users_by_cursus_id.
+        """
+        url = f"{self.BASE}/cursus/{cursus_id}/users/"
 
-        return l_users
+        return self.iter_items(url, filter)
 
     def get_user_info(self, id) -> dict:
         """
@@ -251,66 +337,77 @@ class Intra:
         """
         ENDPOINT = "users"
 
-        with httpx.Client(timeout=self.timeout) as client:
-            url = f"{self.BASE}/{ENDPOINT}/{id}"
-            headers = {"Authorization": f"Bearer {self.access_token}"}
-            r = client.get(url, headers=headers, timeout=self.timeout)
-            tries = 10
-            while r.status_code != 200 and tries > 0:
-                console.log(f"Getting user {id=} Failed! Retrying {tries=}")
-                r = client.get(url, headers=headers)
-                tries -= 1
-                sleep(1)
-            if r.status_code != 200:
-                raise Exception(f"Failed to get user {id=}")
+        url = f"{self.BASE}/{ENDPOINT}/{id}"
+        r = self._request("GET", url)
+        r.raise_for_status()
 
         return r.json()
 
-    def get_user_infos_thr(self, l_ids, delay=0.5, token=None) -> list:
+    def get_user_infos(
+        self, l_ids: Iterable, max_workers: int = None, rounds: int = 2
+    ) -> BulkFetchResult:
         """
-        Get user info by ids using threading to speed up
-        delay more than 0.5 will risk cause 429
-        """
-        user_infos = []
-        thrs = []
+        Get user info by ids on a fixed-size thread pool.
+        At most 2 * max_workers ids are queued at once, so memory stays bounded for large campuses.
+        Ids still failing on a transient error after the retry policy are re-queued,
+        up to `rounds` passes in total, see is_transient.
 
-        def thr_get_user_info(id):
-            user_infos.append(self.get_user_info(id))
+        Args:
+            l_ids (Iterable): The ids or logins of the users, may be a generator.
+            max_workers (int, optional): Pool size. Defaults to settings.INTRA_API["CONCURRENCY"].
+            rounds (int, optional): Passes over the failing ids. Defaults to 2.
 
-        for id in l_ids:
-            thr = threading.Thread(target=thr_get_user_info, args=(id,))
-            thrs.append(thr)
+        Returns:
+            BulkFetchResult: User infos keyed by id in request order, and the ids that failed.
+        """
+        max_workers = max_workers or settings.INTRA_API["CONCURRENCY"]
+        ret = BulkFetchResult()
+        order = []
+        pending = {}
+
+        def _collect(return_when):
+            done, _ = wait(pending, return_when=return_when)
+            for future in done:
+                id = pending.pop(future)
+                try:
+                    ret.results[id] = future.result()
+                except Exception as e:
+                    ret.failures[id] = e
+
+        with ThreadPoolExecutor(max_workers) as pool:
+            for id in l_ids:
+                order.append(id)
+                future = pool.submit(copy_context().run, self.get_user_info, id)
+                pending[future] = id
+                if len(pending) >= 2 * max_workers:
+                    _collect(FIRST_COMPLETED)
+            if pending:
+                _collect(ALL_COMPLETED)
+
+        transient = [id for id, e in ret.failures.items() if is_transient("GET", e)]
+        if transient and rounds > 1:
+            console.log(f"Re-queueing {len(transient)} failed user infos")
+            ret.merge(self.get_user_infos(transient, max_workers, rounds - 1))
+        ret.results = {id: ret.results[id] for id in order if id in ret.results}
 
-        for thr in track(thrs, description="Getting user info"):
-            thr.start()
-            sleep(delay)
+        return ret
 
-        for thr in thrs:
-            thr.join()
+    def get_user_infos_thr(self, l_ids, delay=0, token=None) -> list:
+        """
+        Get user info by ids, see get_user_infos.
+        Kept for callers expecting a list, ids that could not be fetched are logged and left out.
+        """
+        ret = self.get_user_infos(l_ids)
+        for id, e in ret.failures.items():
+            console.log(f"Getting user {id=} Failed! {e!r}")
 
-        return user_infos
+        return list(ret.results.values())
 
     def get_projects_by_cursus(self, cursus_id: int) -> list:
         """
         Get projects by cursus id.
         Useful for getting project infos.
         """
+        url = f"{self.BASE}/cursus/{cursus_id}/projects"
 
-        def _get_projects_at_page(pagenum: int, client: httpx.Client):
-            url = f"{self.BASE}/cursus/{cursus_id}/projects"
-            headers = {"Authorization": f"Bearer {self.access_token}"}
-            params = {
-                "page[number]": pagenum,
-                "page[size]": 100,
-            }
-            r = client.get(url, headers=headers, params=params)
-            return r.json()
-
-        projects = []
-        pagenum = 1
-        with httpx.Client(timeout=self.timeout) as client:
-            while r := _get_projects_at_page(pagenum, client):
-                projects += r
-                pagenum += 1
-
-        return projects
+        return self._paginate(url)
@@ -0,0 +1,102 @@
+"""
+Distributed token-bucket rate limiter for the 42 Intra API.
+
+Buckets live in the default Redis cache so that celery workers, the web
+process and management commands share one budget. Every Intra request takes
+a token from both the per second and the per hour bucket, matching the 42 API
+application quotas set in settings.INTRA_API.
+"""
+
+import asyncio
+from time import sleep
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django_redis import get_redis_connection
+
+KEY_PREFIX = "intraapi:ratelimit"
+
+# KEYS: bucket keys
+# ARGV: rate (tokens/s) and capacity for each key, in the same order
+# Returns the seconds to wait before retrying, "0" if the tokens were taken.
+# Tokens are only taken when every bucket has one, so no budget is wasted.
+ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local wait = 0
+local tokens = {}
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local capacity = tonumber(ARGV[2 * i])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    available = math.min(capacity, available + math.max(0, now - ts) * rate)
+    if available < 1 then
+        wait = math.max(wait, (1 - available) / rate)
+    end
+    tokens[i] = available
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local capacity = tonumber(ARGV[2 * i])
+    if wait == 0 then
+        tokens[i] = tokens[i] - 1
+    end
+    redis.call('HSET', key, 'tokens', tokens[i], 'ts', now)
+    redis.call('EXPIRE', key, math.ceil(capacity / rate) + 1)
+end
+return tostring(wait)
+"""
+
+
+def _buckets() -> list[tuple[str, float, float]]:
+    """
+    The configured buckets as (key, rate per second, capacity).
+    A limit set to None is disabled.
+    """
+    conf = settings.INTRA_API
+    ret = []
+    if conf["RATE_LIMIT_PER_SECOND"]:
+        per_second = conf["RATE_LIMIT_PER_SECOND"]
+        ret.append((f"{KEY_PREFIX}:second", per_second, per_second))
+    if conf["RATE_LIMIT_PER_HOUR"]:
+        per_hour = conf["RATE_LIMIT_PER_HOUR"]
+        ret.append((f"{KEY_PREFIX}:hour", per_hour / 3600, per_hour))
+
+    return ret
+
+
+def try_acquire() -> float:
+    """
+    Tries to take one token from every bucket.
+
+    Returns:
+        float: 0 if the request may proceed, otherwise the seconds to wait before trying again.
+    """
+    buckets = _buckets()
+    if not buckets:
+        return 0
+    keys = [key for key, _, _ in buckets]
+    args = []
+    for _, rate, capacity in buckets:
+        args += [rate, capacity]
+    conn = get_redis_connection("default")
+
+    return float(conn.eval(ACQUIRE_SCRIPT, len(keys), *keys, *args))
+
+
+def acquire() -> None:
+    """
+    Blocks until a request to the Intra API is allowed.
+    """
+    while wait := try_acquire():
+        sleep(wait)
+
+
+async def aacquire() -> None:
+    """
+    Waits until a request to the Intra API is allowed, without blocking the event loop.
+    """
+    while wait := await sync_to_async(try_acquire, thread_sensitive=False)():
+        await asyncio.sleep(wait)
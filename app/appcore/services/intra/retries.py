@@ -0,0 +1,131 @@
+"""
+Retry policy shared by every Intra request.
+- 429: wait for Retry-After when given, backoff otherwise
+- 5xx and connection errors: exponential backoff with full jitter
+- other 4xx: no retry, the caller fails fast on raise_for_status()
+Non-idempotent requests (e.g. adding points) are only retried when the server
+surely did not process them: 429 or a failure to connect.
+"""
+
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import httpx
+from django.conf import settings
+
+IDEMPOTENT_METHODS = ["GET", "HEAD", "OPTIONS", "PUT", "DELETE"]
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def should_retry(method: str, response: httpx.Response) -> bool:
+    """
+    Whether the response is transient and worth retrying.
+
+    Args:
+        method (str): The HTTP method of the request.
+        response (httpx.Response): The response.
+
+    Returns:
+        bool: True on 429, and on 5xx for idempotent methods.
+    """
+    if response.status_code == 429:
+        return True
+
+    return response.status_code >= 500 and method.upper() in IDEMPOTENT_METHODS
+
+
+def should_retry_error(method: str, error: httpx.TransportError) -> bool:
+    """
+    Whether the connection error is worth retrying.
+
+    Args:
+        method (str): The HTTP method of the request.
+        error (httpx.TransportError): The error raised by httpx.
+
+    Returns:
+        bool: True for idempotent methods, or if the request was never sent.
+    """
+    return method.upper() in IDEMPOTENT_METHODS or isinstance(error, NOT_SENT_ERRORS)
+
+
+def is_transient(method: str, error: Exception) -> bool:
+    """
+    Whether a request that failed after its retries is worth trying again later.
+
+    Args:
+        method (str): The HTTP method of the request.
+        error (Exception): The error it raised.
+
+    Returns:
+        bool: True for the errors should_retry or should_retry_error accept,
+            False for any other, e.g. a 404.
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        return should_retry(method, error.response)
+    if isinstance(error, httpx.TransportError):
+        return should_retry_error(method, error)
+
+    return False
+
+
+def retry_after(response: httpx.Response) -> float | None:
+    """
+    Parses the Retry-After header, given in seconds or as an HTTP date.
+
+    Args:
+        response (httpx.Response): The response.
+
+    Returns:
+        float | None: The seconds to wait, None if the header is missing or invalid.
+    """
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        dt = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+
+    return max(0.0, (dt - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff(attempt: int) -> float:
+    """
+    Exponential backoff with full jitter.
+
+    Args:
+        attempt (int): The number of attempts made so far, starting at 1.
+
+    Returns:
+        float: The seconds to wait before the next attempt.
+    """
+    conf = settings.INTRA_API
+    cap = min(conf["RETRY_BACKOFF_MAX"], conf["RETRY_BACKOFF"] * 2 ** (attempt - 1))
+
+    return random.uniform(0, cap)
+
+
+def retry_delay(attempt: int, response: httpx.Response | None = None) -> float:
+    """
+    The seconds to wait before retrying.
+
+    Args:
+        attempt (int): The number of attempts made so far, starting at 1.
+        response (httpx.Response, optional): The failed response, None on connection errors.
+
+    Returns:
+        float: The seconds to wait.
+    """
+    if response is not None and response.status_code == 429:
+        wait = retry_after(response)
+        if wait is not None:
+            return wait
+
+    return backoff(attempt)
@@ -0,0 +1,244 @@
+"""
+Read-only views over stored Intra user data.
+
+IntraUserData holds the accessors shared by the API-backed IntraUser and by
+IntraUserSnapshot, a slot-based view for reports over many cadets: no API
+client, no pydantic validation, no per-instance closures.
+
+Usage:
+    users = IntraUserSnapshot.bulk(hist.data for hist in hists)
+    users[0].level(cursus_id=21)
+
+The per-user metrics are a cohort of one, see appcore.services.intra.cohorts
+to compute them for many users at once.
+"""
+
+from datetime import datetime
+from typing import Iterable
+
+from dateutil.parser import parse as datetime_parse
+from django.utils import timezone
+
+from appcore.services.intra import cohorts
+
+
+def _build_indexes(data: dict) -> tuple[dict, dict, dict]:
+    """
+    Lookup indexes over the user data, the first entry listed wins.
+
+    Returns:
+        tuple[dict, dict, dict]: cursus_id -> cursus_user,
+            cursus_id -> project_users in listed order,
+            (cursus_id, project slug) -> project_user.
+    """
+    cursus_users = {}
+    for cu in data["cursus_users"]:
+        cursus_users.setdefault(cu["cursus_id"], cu)
+    project_users = {}
+    projects = {}
+    for pu in data["projects_users"]:
+        for cursus_id in pu["cursus_ids"]:
+            project_users.setdefault(cursus_id, []).append(pu)
+            projects.setdefault((cursus_id, pu["project"]["slug"]), pu)
+
+    return cursus_users, project_users, projects
+
+
+class IntraUserData:
+    """
+    Accessors over the data of an Intra user, see IntraUser and IntraUserSnapshot.
+    Subclasses provide `login`, `data`, `pts_gain`, `pts_lost` and `_indexes`,
+    and reset `_indexes` to None whenever `data` is replaced.
+    """
+
+    __slots__ = ()
+
+    def _index(self) -> tuple[dict, dict, dict]:
+        """
+        The lookup indexes, built on first use, see _build_indexes.
+        """
+        if self._indexes is None:
+            self._indexes = _build_indexes(self.data)
+
+        return self._indexes
+
+    @property
+    def id(self) -> int:
+        """
+        Get the ID of the user.
+
+        Returns:
+            int: The ID of the user.
+        """
+        return self.data["id"]
+
+    @property
+    def correction_point(self) -> int:
+        """
+        Returns the correction point of the user.
+        Returns:
+            int: The correction point of the user.
+        """
+        return self.data["correction_point"]
+
+    def level(self, cursus_id: int) -> int:
+        """
+        Return the level of the user in the given cursus. 0 if not in the cursus.
+        :param cursus_id: The cursus id.
+        :return: The level of the user in the given cursus.
+        """
+        cu = self._index()[0].get(cursus_id)
+        if cu is None:
+            return 0
+
+        return cu["level"]
+
+    def project_users(self, cursus_id: int) -> list:
+        """
+        Return the project users of the user in the given cursus. [] if not in the cursus.
+        :param cursus_id: The cursus id.
+        :return: The project users of the user in the given cursus.
+        """
+        return list(self._index()[1].get(cursus_id, []))
+
+    def calc_total_tries(self, cursus_id):
+        """
+        Returns total number of tries by user in given cursus_id
+        """
+        return cohorts.total_tries([self], cursus_id).iloc[0]
+
+    def project_final_mark(self, cursus_id: int, project_slug: str) -> int | None:
+        """
+        Return the final mark of the user in the given project. None if not in the project.
+        :param project_slug: The project slug.
+        :param cursus_id: The cursus id.
+        :return: The final mark of the user in the given project.
+        """
+        project = self._index()[2].get((cursus_id, project_slug))
+        if project is None:
+            return None
+
+        return project["final_mark"]
+
+    def project(self, cursus_id: int, project_slug: str) -> dict:
+        """
+        Return the project of the user in the given cursus. {} if not in the cursus.
+        :param cursus_id: The cursus id.
+        :return: The project of the user in the given cursus.
+        """
+        return self._index()[2].get((cursus_id, project_slug), {})
+
+    def blackholed_at(self, cursus_id: int = 21) -> datetime:
+        """
+        Returns the blackholed_at datetime for the given cursus_id.
+
+        Args:
+            cursus_id (int): The ID of the cursus.
+
+        Returns:
+            datetime: The blackholed_at datetime if available, None otherwise.
+
+        Raises:
+            ValueError: If the user is not in the specified cursus.
+        """
+        cursus = self._index()[0].get(cursus_id)
+        if cursus is None:
+            raise ValueError("User is not in this cursus")
+        if cursus["blackholed_at"] is None:
+            return None
+
+        return datetime_parse(cursus["blackholed_at"])
+
+    def is_blackholed(self, cursus_id: int = 21) -> bool:
+        """
+        Check if the user is blackholed for the given cursus.
+
+        Args:
+            cursus_id (int): The ID of the cursus. Default is 21.
+
+        Returns:
+            bool: True if the user is blackholed, False otherwise.
+        """
+        blackholed_at = self.blackholed_at(cursus_id)
+        if blackholed_at is None:
+            return False
+
+        return blackholed_at < timezone.now()
+
+    def calc_eval_pts_gainloss(self, l_eval_hists: list) -> tuple[int, int]:
+        """
+        Returns total sum of current points gained/ loss by evaluation
+        Sets self.pts_gain and self.pts_lost
+        Args:
+            l_eval_hists (list): The correction point history, e.g. the results of AsyncIntra.gather_correction_point_hists.
+        Returns:
+            tuple[int, int]: The total points gained and lost by evaluation.
+        """
+        totals = cohorts.eval_pts_gainloss([self], {self.login: l_eval_hists})
+        self.pts_gain = totals["pts_gain"].iloc[0]
+        self.pts_lost = totals["pts_lost"].iloc[0]
+
+        return self.pts_gain, self.pts_lost
+
+    def get_last_active_date_by_project_update(self, cursus_id):
+        """
+        Return the last active date of the user in the given cursus. '1970-01-01T00:00:00Z' if KeyErro
+        :param cursus_id: The cursus id.
+        :return: The last active date of the user in the given cursus.
+        """
+        return cohorts.last_active_dates([self], cursus_id).iloc[0]
+
+    def get_days_since_last_active_date_by_project_update(self, cursus_id):
+        """
+        Return the days since the last active date of the user in the given cursus. Returns very big number if ERRORs.
+        :param cursus_id: The cursus id.
+        :return: The days since the last active date of the user in the given cursus.
+        """
+        return cohorts.days_inactive([self], cursus_id).iloc[0]
+
+    def __repr__(self):
+        return f"<User {self.login}>"
+
+    def __str__(self):
+        return self.login
+
+
+class IntraUserSnapshot(IntraUserData):
+    """
+    Read-only view of stored Intra user data, e.g. HistIntraProfileData.data.
+    Same accessors as IntraUser without the API client, for reports over many cadets.
+    """
+
+    __slots__ = ("login", "_data", "_indexes", "pts_gain", "pts_lost")
+
+    def __init__(self, data: dict, login: str = None):
+        """
+        Args:
+            data (dict): The user data, as returned by /users/:id. Not copied nor validated.
+            login (str, optional): Defaults to data["login"].
+        """
+        self.login = login or data["login"]
+        self._data = data
+        self._indexes = None
+        self.pts_gain: int | None = None
+        self.pts_lost: int | None = None
+
+    @property
+    def data(self) -> dict:
+        """
+        The stored user data.
+        """
+        return self._data
+
+    @classmethod
+    def bulk(cls, datas: Iterable[dict]) -> list["IntraUserSnapshot"]:
+        """
+        Builds a snapshot of each user data.
+
+        Args:
+            datas (Iterable[dict]): User datas, e.g. HistIntraProfileData.data of many profiles.
+
+        Returns:
+            list[IntraUserSnapshot]: In the same order.
+        """
+        return [cls(data) for data in datas]
@@ -0,0 +1,123 @@
+"""
+Access token for the 42 Intra API.
+
+The token is kept in-process in front of the Redis cache, so hot paths do not
+pay a Redis round-trip per request. On expiry a single caller per process
+(thread lock) and per cluster (Redis lock) fetches a new token while the
+others wait and reuse it.
+"""
+
+import os
+import threading
+import time
+
+from django.core.cache import cache
+
+from appcore.services.env_manager import ENVS
+from appcore.services.intra.clients import get_client
+
+CACHE_KEY = "intraapi:access-token"
+LOCK_KEY = "intraapi:access-token:lock"
+
+_token: str | None = None
+_expires_at: float = 0
+_lock = threading.Lock()
+
+
+def cached_access_token() -> str | None:
+    """
+    The in-process token, without touching Redis.
+
+    Returns:
+        str | None: The token, None if missing or expired.
+    """
+    if _token is not None and time.time() < _expires_at:
+        return _token
+
+    return None
+
+
+def _from_cache() -> tuple[str | None, int]:
+    """
+    Reads the token shared through Redis.
+
+    Returns:
+        tuple[str | None, int]: The token and its remaining seconds to live.
+    """
+    token = cache.get(CACHE_KEY)
+    if token is None:
+        return None, 0
+
+    return token, cache.ttl(CACHE_KEY) or 0
+
+
+def _fetch(base: str) -> tuple[str, int]:
+    """
+    Fetches a new token from the API.
+
+    Args:
+        base (str): The API base URL.
+
+    Returns:
+        tuple[str, int]: The token and its seconds to live, with a minute of margin.
+
+    Raises:
+        httpx.HTTPStatusError: If the token cannot be fetched.
+    """
+    r = get_client().post(
+        f"{base}/oauth/token",
+        data={"grant_type": "client_credentials"},
+        auth=(ENVS["FORTY_TWO_CLIENT_ID"], ENVS["FORTY_TWO_CLIENT_SECRET"]),
+    )
+    r.raise_for_status()
+    payload = r.json()
+
+    return payload["access_token"], payload["expires_in"] - 60
+
+
+def get_access_token(base: str) -> str:
+    """
+    Retrieves the access token, from memory, then Redis, then the API.
+
+    Args:
+        base (str): The API base URL, used on refresh.
+
+    Returns:
+        str: The access token.
+
+    Raises:
+        redis.exceptions.LockError: If another caller holds the refresh lock for too long.
+        httpx.HTTPStatusError: If the token cannot be fetched.
+    """
+    global _token, _expires_at
+
+    if token := cached_access_token():
+        return token
+
+    with _lock:
+        if token := cached_access_token():
+            return token
+
+        token, ttl = _from_cache()
+        if token is None:
+            with cache.lock(LOCK_KEY, timeout=60, blocking_timeout=60):
+                token, ttl = _from_cache()
+                if token is None:
+                    token, ttl = _fetch(base)
+                    cache.set(CACHE_KEY, token, ttl)
+        _token = token
+        _expires_at = time.time() + ttl
+
+    return token
+
+
+def _reset_after_fork() -> None:
+    """
+    Recreates the lock in a forked child, the parent may have held it.
+    """
+    global _lock
+
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
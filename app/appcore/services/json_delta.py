@@ -0,0 +1,114 @@
+"""
+Content hashes and compact deltas between JSON documents.
+
+A delta describes how to turn one dict (or list) into another:
+    {"set": {key: value}, "del": [key], "sub": {key: delta}, "len": n}
+"set" replaces values, "del" drops dict keys, "sub" recurses into a nested
+dict or list and "len" truncates or extends a list. List indexes are string
+keys, as JSON objects require. Empty parts are left out, so {} means equal.
+
+Usage:
+    delta = diff(old, new)
+    assert patch(old, delta) == new
+"""
+
+import hashlib
+import json
+
+
+def content_hash(data) -> str:
+    """
+    Hash of a JSON document, independent of key order.
+
+    Returns:
+        str: The sha256 hex digest of the canonical serialization.
+    """
+    canonical = json.dumps(
+        data, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _items(container: dict | list) -> dict:
+    if isinstance(container, list):
+        return {str(i): value for i, value in enumerate(container)}
+
+    return container
+
+
+def _equal(a, b) -> bool:
+    """
+    Deep equality as content_hash sees it: unlike ==, True is not 1 and 1 is not 1.0.
+    """
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_equal(a[key], b[key]) for key in a)
+    if isinstance(a, list):
+        return len(a) == len(b) and all(_equal(x, y) for x, y in zip(a, b))
+
+    return a == b
+
+
+def diff(old: dict | list, new: dict | list) -> dict:
+    """
+    The delta turning `old` into `new`, both dicts or both lists.
+
+    Returns:
+        dict: The delta, see the module docstring.
+    """
+    old_items, new_items = _items(old), _items(new)
+    set_, sub = {}, {}
+    for key, value in new_items.items():
+        if key not in old_items:
+            set_[key] = value
+            continue
+        previous = old_items[key]
+        if _equal(previous, value):
+            continue
+        if isinstance(value, (dict, list)) and type(previous) is type(value):
+            sub[key] = diff(previous, value)
+        else:
+            set_[key] = value
+
+    ret = {}
+    if set_:
+        ret["set"] = set_
+    if sub:
+        ret["sub"] = sub
+    if isinstance(new, list):
+        if len(new) != len(old):
+            ret["len"] = len(new)
+    elif removed := [key for key in old if key not in new]:
+        ret["del"] = removed
+
+    return ret
+
+
+def patch(base: dict | list, delta: dict) -> dict | list:
+    """
+    Applies a delta from `diff`. `base` is not modified, unchanged nested
+    values are shared with it.
+
+    Returns:
+        dict | list: The patched document.
+    """
+    if isinstance(base, list):
+        length = delta.get("len", len(base))
+        ret = base[:length] + [None] * (length - len(base))
+        for key, value in delta.get("set", {}).items():
+            ret[int(key)] = value
+        for key, sub in delta.get("sub", {}).items():
+            ret[int(key)] = patch(ret[int(key)], sub)
+
+        return ret
+
+    ret = dict(base)
+    for key in delta.get("del", []):
+        del ret[key]
+    ret.update(delta.get("set", {}))
+    for key, sub in delta.get("sub", {}).items():
+        ret[key] = patch(ret[key], sub)
+
+    return ret
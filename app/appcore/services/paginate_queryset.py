@@ -1,9 +1,16 @@
+import base64
+import hashlib
+import json
 import math
-from typing import Any
+from typing import Any, Optional
 
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Q
 from django.db.models.query import QuerySet
 from ninja import Schema
-from ninja.pagination import PageNumberPagination
+from ninja.errors import HttpError
+from ninja.pagination import PageNumberPagination, PaginationBase
 
 
 class PageNumberPaginationExt(PageNumberPagination):
@@ -23,9 +30,120 @@ class PageNumberPaginationExt(PageNumberPagination):
         **params: Any,
     ) -> Any:
         offset = (pagination.page - 1) * self.page_size
+        count = self._items_count(queryset)
         ret = {
             "items": queryset[offset : offset + self.page_size],
-            "count": self._items_count(queryset),
-            "total_page": math.ceil(self._items_count(queryset) / self.page_size),
+            "count": count,
+            "total_page": math.ceil(count / self.page_size),
+        }
+        return ret
+
+
+class CursorPagination(PaginationBase):
+    """Keyset pagination cls for ninja
+    - no offset: a page resumes after the last item of the previous one, deep pages cost as much as the first
+    - no count, unless `with_total` is asked, the total is then cached for `total_timeout` seconds
+    - `next` is an opaque cursor, None on the last page
+
+    ordering: the fields to page on, "-" prefixed for descending, the pk is added as tie-breaker
+    """
+
+    class Input(Schema):
+        cursor: Optional[str] = None
+        with_total: bool = False
+
+    class Output(Schema):
+        next: Optional[str]
+        total: Optional[int]
+        items: list[Any]
+
+    def __init__(
+        self,
+        ordering: tuple[str, ...] = ("pk",),
+        page_size: int = 100,
+        total_timeout: int = 300,
+        **kwargs: Any,
+    ) -> None:
+        self.ordering = tuple(ordering)
+        if not {"pk", "-pk"} & set(self.ordering):
+            self.ordering += ("pk",)
+        self.page_size = page_size
+        self.total_timeout = total_timeout
+        super().__init__(**kwargs)
+
+    def _encode(self, values: list) -> str:
+        # str() keeps the microseconds of datetimes, DjangoJSONEncoder drops them
+        raw = json.dumps(values, default=str).encode()
+
+        return base64.urlsafe_b64encode(raw).decode()
+
+    def _decode(self, cursor: str) -> list:
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except ValueError:
+            raise HttpError(400, "Invalid cursor")
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise HttpError(400, "Invalid cursor")
+        if not all(
+            value is None or isinstance(value, (str, int, float)) for value in values
+        ):
+            raise HttpError(400, "Invalid cursor")
+
+        return values
+
+    def _after(self, values: list) -> Q:
+        """
+        Items strictly after the given values, in ordering.
+        (a, b) > (x, y) is a > x OR (a = x AND b > y), per field direction.
+        """
+        ret = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            ret |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+
+        return ret
+
+    def _values(self, item: Any) -> list:
+        names = [field.lstrip("-") for field in self.ordering]
+        if isinstance(item, dict):
+            return [item[name] for name in names]
+
+        return [getattr(item, name) for name in names]
+
+    def _total(self, queryset: QuerySet) -> int:
+        sql, params = queryset.query.sql_with_params()
+        digest = hashlib.sha256(f"{sql}{params}".encode()).hexdigest()
+
+        return cache.get_or_set(
+            f"pagination:total:{digest}",
+            lambda: self._items_count(queryset),
+            self.total_timeout,
+        )
+
+    def paginate_queryset(
+        self,
+        queryset: QuerySet,
+        pagination: Input,
+        **params: Any,
+    ) -> Any:
+        page = queryset.order_by(*self.ordering)
+        if pagination.cursor:
+            # the fields check the values of a forged cursor when the lookups are built
+            try:
+                page = page.filter(self._after(self._decode(pagination.cursor)))
+            except (ValidationError, ValueError, TypeError):
+                raise HttpError(400, "Invalid cursor")
+        items = list(page[: self.page_size + 1])
+        next_cursor = None
+        if len(items) > self.page_size:
+            items = items[: self.page_size]
+            next_cursor = self._encode(self._values(items[-1]))
+        ret = {
+            "items": items,
+            "next": next_cursor,
+            "total": self._total(queryset) if pagination.with_total else None,
         }
         return ret
@@ -0,0 +1,92 @@
+"""
+Response cache for read-only routes over synced data.
+
+Responses are stored in CACHES["default"] under a key made of the data
+generation, the path, the query parameters and a hash of the Authorization
+header. A sync bumps the generation once its changes are committed, so no
+entry outlives it: keys of the previous generation are never read again and
+expire.
+
+Usage:
+    @router.get("/latest/", ...)
+    @decorate_view(cached_response)
+    def get_latest(request): ...
+
+    if changed:
+        bump_data_generation()
+"""
+
+import hashlib
+from typing import Callable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+DATA_GENERATION_KEY = "response-cache:data-generation"
+KEY_PREFIX = "response-cache:response"
+
+
+def data_generation() -> int:
+    """
+    The current data generation, 0 until the first bump.
+    """
+    return cache.get(DATA_GENERATION_KEY, 0)
+
+
+def bump_data_generation() -> int:
+    """
+    Invalidates every cached response, call it once per sync after its changes are committed.
+    Returns:
+        int: The new generation.
+    """
+    try:
+        return cache.incr(DATA_GENERATION_KEY)
+    except ValueError:
+        # missing key, add() loses to a concurrent first bump
+        if cache.add(DATA_GENERATION_KEY, 1, None):
+            return 1
+        return cache.incr(DATA_GENERATION_KEY)
+
+
+def _cache_key(request) -> str:
+    """
+    Key of the response to the request in the current data generation.
+    The Authorization header is part of it, so credentials never share an entry.
+    """
+    query = sorted(request.GET.lists())
+    auth = request.headers.get("Authorization", "")
+    digest = hashlib.sha256(f"{request.path}|{query}|{auth}".encode()).hexdigest()
+
+    return f"{KEY_PREFIX}:{data_generation()}:{digest}"
+
+
+def cached_response(run: Callable) -> Callable:
+    """
+    View decorator caching the successful responses of a GET operation, see ninja.decorators.decorate_view
+    A hit is only served once the auth of the operation accepted the request.
+    """
+    # decorate_view wraps the bound Operation.run
+    operation = run.__self__
+
+    def wrapper(request, *args, **kwargs):
+        timeout = settings.RESPONSE_CACHE_TIMEOUT
+        if request.method != "GET" or timeout is None:
+            return run(request, *args, **kwargs)
+
+        key = _cache_key(request)
+        hit = cache.get(key)
+        if hit is not None:
+            error = operation._run_checks(request)
+            if error:
+                return error
+            content, content_type = hit
+            return HttpResponse(content, content_type=content_type)
+
+        response = run(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            cache.set(key, (response.content, response["Content-Type"]), timeout)
+
+        return response
+
+    return wrapper
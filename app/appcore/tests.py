@@ -1,3 +1,201 @@
-from django.test import TestCase
+import base64
+import datetime
+import json
+import random
+import uuid
+from functools import cmp_to_key
 
-# Create your tests here.
+from django.db.models import Q
+from django.test import SimpleTestCase
+from ninja.errors import HttpError
+
+from appcore.services import json_delta
+from appcore.services.paginate_queryset import CursorPagination
+from appdata.models.intras import HistIntraProfileData
+
+
+def _random_json(rng: random.Random, depth: int = 0):
+    kind = rng.choice(["scalar"] * 3 + (["dict", "list"] if depth < 3 else []))
+    if kind == "dict":
+        return {
+            rng.choice("abcdef"): _random_json(rng, depth + 1)
+            for _ in range(rng.randint(0, 4))
+        }
+    if kind == "list":
+        return [_random_json(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+
+    return rng.choice([None, True, False, 0, 1, 1.0, 0.0, 2, "", "a", "1"])
+
+
+def _mutate(rng: random.Random, value):
+    if isinstance(value, dict):
+        ret = {key: _mutate(rng, v) for key, v in value.items() if rng.random() > 0.2}
+        if rng.random() < 0.3:
+            ret[rng.choice("abcdefgh")] = _random_json(rng, 2)
+        return ret
+    if isinstance(value, list):
+        ret = [_mutate(rng, v) for v in value if rng.random() > 0.2]
+        while rng.random() < 0.3:
+            ret.append(_random_json(rng, 2))
+        return ret
+    if rng.random() < 0.5:
+        return _random_json(rng, 3)
+
+    return value
+
+
+class JSONDeltaTests(SimpleTestCase):
+    def assertRoundTrip(self, old, new):
+        delta = json_delta.diff(old, new)
+        patched = json_delta.patch(old, delta)
+        self.assertEqual(json_delta.content_hash(patched), json_delta.content_hash(new))
+        return delta
+
+    def test_equal_documents(self):
+        data = {"a": [1, {"b": None}], "c": "x"}
+        self.assertEqual(json_delta.diff(data, {**data}), {})
+
+    def test_bool_int_float_are_changes(self):
+        delta = self.assertRoundTrip({"a": True, "v": 0}, {"a": 1, "v": False})
+        self.assertEqual(delta, {"set": {"a": 1, "v": False}})
+        self.assertRoundTrip({"x": 1}, {"x": 1.0})
+        self.assertRoundTrip({"x": [0, 1]}, {"x": [False, True]})
+        self.assertRoundTrip([{"y": 1.0}], [{"y": 1}])
+
+    def test_dict_keys_added_and_removed(self):
+        delta = self.assertRoundTrip({"a": 1, "b": 2}, {"b": 2, "c": 3})
+        self.assertEqual(delta, {"set": {"c": 3}, "del": ["a"]})
+
+    def test_list_shrink_and_grow(self):
+        self.assertEqual(self.assertRoundTrip([1, 2, 3], [1]), {"len": 1})
+        self.assertEqual(
+            self.assertRoundTrip([1], [1, 2, None]),
+            {"set": {"1": 2, "2": None}, "len": 3},
+        )
+        self.assertRoundTrip({"l": [1, [2, 3]]}, {"l": [1, [2]]})
+        self.assertRoundTrip({"l": []}, {"l": [[], {}]})
+
+    def test_type_changes(self):
+        self.assertRoundTrip({"a": [1]}, {"a": {"0": 1}})
+        self.assertRoundTrip({"a": {"0": 1}}, {"a": [1]})
+        self.assertRoundTrip({"a": None}, {"a": {"b": 1}})
+
+    def test_patch_keeps_base(self):
+        base = {"a": {"b": [1, 2]}, "c": 1}
+        json_delta.patch(base, json_delta.diff(base, {"a": {"b": [3]}}))
+        self.assertEqual(base, {"a": {"b": [1, 2]}, "c": 1})
+
+    def test_random_round_trips(self):
+        rng = random.Random(42)
+        for _ in range(5000):
+            old = {"root": _random_json(rng)}
+            self.assertRoundTrip(old, _mutate(rng, old))
+
+    def test_content_hash_ignores_key_order(self):
+        self.assertEqual(
+            json_delta.content_hash({"a": 1, "b": 2}),
+            json_delta.content_hash({"b": 2, "a": 1}),
+        )
+        self.assertNotEqual(
+            json_delta.content_hash({"a": 1}), json_delta.content_hash({"a": True})
+        )
+
+
+def _matches(q: Q, row: dict) -> bool:
+    """Evaluates a Q of exact/gt/lt lookups against a row, as the database would"""
+    results = []
+    for child in q.children:
+        if isinstance(child, Q):
+            results.append(_matches(child, row))
+            continue
+        name, value = child
+        name, _, lookup = name.partition("__")
+        if lookup == "gt":
+            results.append(row[name] > value)
+        elif lookup == "lt":
+            results.append(row[name] < value)
+        else:
+            results.append(row[name] == value)
+    ret = all(results) if q.connector == Q.AND else any(results)
+
+    return not ret if q.negated else ret
+
+
+def _cursor(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+class CursorPaginationTests(SimpleTestCase):
+    def test_pk_tie_breaker(self):
+        self.assertEqual(CursorPagination().ordering, ("pk",))
+        self.assertEqual(CursorPagination(ordering=("-a",)).ordering, ("-a", "pk"))
+        self.assertEqual(CursorPagination(ordering=("a", "-pk")).ordering, ("a", "-pk"))
+
+    def test_after_follows_ordering(self):
+        rng = random.Random(42)
+        rows = [
+            {"a": rng.randint(0, 3), "b": rng.randint(0, 3), "pk": pk}
+            for pk in range(200)
+        ]
+        for ordering in [("a",), ("-a",), ("a", "b"), ("a", "-b"), ("-a", "-b", "-pk")]:
+            paginator = CursorPagination(ordering=ordering)
+
+            def compare(x, y):
+                for field in paginator.ordering:
+                    name = field.lstrip("-")
+                    if x[name] != y[name]:
+                        ret = -1 if x[name] < y[name] else 1
+                        return -ret if field.startswith("-") else ret
+                return 0
+
+            ordered = sorted(rows, key=cmp_to_key(compare))
+            for i, row in enumerate(ordered):
+                after = paginator._after(paginator._values(row))
+                with self.subTest(ordering=ordering, row=row):
+                    self.assertEqual(
+                        [item for item in ordered if _matches(after, item)],
+                        ordered[i + 1 :],
+                    )
+
+    def test_values_from_dict_and_object(self):
+        paginator = CursorPagination(ordering=("-created",))
+        hist = HistIntraProfileData(
+            id=uuid.uuid4(), created=datetime.datetime(2024, 1, 1)
+        )
+        self.assertEqual(paginator._values(hist), [hist.created, hist.id])
+        self.assertEqual(paginator._values({"created": 1, "pk": 2, "other": 3}), [1, 2])
+
+    def test_cursor_round_trip(self):
+        paginator = CursorPagination(ordering=("-created",))
+        created = datetime.datetime(2024, 1, 1, 12, 0, 0, 123456, tzinfo=datetime.UTC)
+        pk = uuid.uuid4()
+        values = paginator._decode(paginator._encode([created, pk]))
+        self.assertEqual(values, [str(created), str(pk)])
+        # the decoded strings are valid lookups values, microseconds included
+        after = paginator._after(values)
+        HistIntraProfileData.objects.order_by(*paginator.ordering).filter(after)
+        self.assertIn(("created__lt", str(created)), after.children)
+
+    def test_invalid_cursors(self):
+        paginator = CursorPagination(ordering=("-created",))
+        queryset = HistIntraProfileData.objects.all()
+        valid = [
+            str(datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)),
+            str(uuid.uuid4()),
+        ]
+        cursors = {
+            "not base64": "!!!",
+            "not json": base64.urlsafe_b64encode(b"{").decode(),
+            "not a list": _cursor({"created": valid[0]}),
+            "too short": _cursor(valid[:1]),
+            "too long": _cursor(valid + [1]),
+            "nested value": _cursor([[valid[0]], valid[1]]),
+            "invalid datetime": _cursor(["yesterday", valid[1]]),
+            "invalid uuid": _cursor([valid[0], "1"]),
+        }
+        for name, cursor in cursors.items():
+            with self.subTest(name), self.assertRaises(HttpError) as ctx:
+                paginator.paginate_queryset(
+                    queryset, CursorPagination.Input(cursor=cursor)
+                )
+            self.assertEqual(ctx.exception.status_code, 400)
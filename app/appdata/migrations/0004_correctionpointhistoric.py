@@ -0,0 +1,53 @@
+# Generated by Django 5.0.2 on 2026-10-18 09:00
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appdata", "0003_alter_intraprofile_login"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CorrectionPointHistoric",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("updated", models.DateTimeField(auto_now=True)),
+                ("intra_id", models.BigIntegerField(unique=True)),
+                ("reason", models.CharField(max_length=255)),
+                ("sum", models.IntegerField()),
+                ("total", models.IntegerField()),
+                ("scale_team_id", models.IntegerField(blank=True, null=True)),
+                ("intra_created_at", models.DateTimeField()),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="correction_point_historics",
+                        to="appdata.intraprofile",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["profile", "-intra_created_at"],
+                        name="appdata_cph_profile_created",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.2 on 2026-10-18 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_latest_data(apps, schema_editor):
+    IntraProfile = apps.get_model("appdata", "IntraProfile")
+    HistIntraProfileData = apps.get_model("appdata", "HistIntraProfileData")
+    latest = HistIntraProfileData.objects.filter(profile=OuterRef("pk")).order_by(
+        "-created"
+    )
+    IntraProfile.objects.update(latest_data=Subquery(latest.values("pk")[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appdata", "0004_correctionpointhistoric"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="intraprofile",
+            name="latest_data",
+            field=models.OneToOneField(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="latest_of",
+                to="appdata.histintraprofiledata",
+            ),
+        ),
+        migrations.RunPython(backfill_latest_data, migrations.RunPython.noop),
+    ]
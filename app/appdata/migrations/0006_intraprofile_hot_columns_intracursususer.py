@@ -0,0 +1,135 @@
+# Generated by Django 5.0.2 on 2026-10-18 11:00
+
+import django.db.models.deletion
+import uuid
+from dateutil.parser import isoparse
+from django.db import migrations, models
+
+
+def _parse_date(value):
+    return isoparse(value) if value else None
+
+
+def backfill_hot_columns(apps, schema_editor):
+    IntraProfile = apps.get_model("appdata", "IntraProfile")
+    IntraCursusUser = apps.get_model("appdata", "IntraCursusUser")
+    profiles = []
+    cursus_users = []
+    for profile in (
+        IntraProfile.objects.filter(latest_data__isnull=False)
+        .select_related("latest_data")
+        .iterator(chunk_size=500)
+    ):
+        data = profile.latest_data.data
+        profile.email = data.get("email")
+        profile.first_name = data.get("first_name")
+        profile.last_name = data.get("last_name")
+        profile.correction_point = data.get("correction_point")
+        profiles.append(profile)
+        seen = set()
+        for cursus_user in data.get("cursus_users", []):
+            if cursus_user["cursus_id"] in seen:
+                continue
+            seen.add(cursus_user["cursus_id"])
+            cursus_users.append(
+                IntraCursusUser(
+                    profile=profile,
+                    cursus_id=cursus_user["cursus_id"],
+                    cursus_slug=cursus_user["cursus"]["slug"],
+                    level=cursus_user["level"] or 0,
+                    grade=cursus_user.get("grade"),
+                    begin_at=_parse_date(cursus_user.get("begin_at")),
+                    blackholed_at=_parse_date(cursus_user.get("blackholed_at")),
+                )
+            )
+    IntraProfile.objects.bulk_update(
+        profiles,
+        ["email", "first_name", "last_name", "correction_point"],
+        batch_size=500,
+    )
+    IntraCursusUser.objects.bulk_create(cursus_users, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appdata", "0005_intraprofile_latest_data"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="intraprofile",
+            name="email",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name="intraprofile",
+            name="first_name",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name="intraprofile",
+            name="last_name",
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name="intraprofile",
+            name="correction_point",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="intraprofile",
+            index=models.Index(
+                fields=["pool_year", "pool_month"], name="appdata_ip_pool"
+            ),
+        ),
+        migrations.CreateModel(
+            name="IntraCursusUser",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("updated", models.DateTimeField(auto_now=True)),
+                ("cursus_id", models.IntegerField()),
+                ("cursus_slug", models.CharField(max_length=255)),
+                ("level", models.FloatField(default=0)),
+                ("grade", models.CharField(blank=True, max_length=255, null=True)),
+                ("begin_at", models.DateTimeField(blank=True, null=True)),
+                ("blackholed_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="cursus_users",
+                        to="appdata.intraprofile",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["cursus_id", "blackholed_at"],
+                        name="appdata_icu_cursus_bh",
+                    ),
+                    models.Index(
+                        fields=["cursus_id", "-level"],
+                        name="appdata_icu_cursus_level",
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("profile", "cursus_id"),
+                        name="appdata_icu_profile_cursus",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_hot_columns, migrations.RunPython.noop),
+    ]
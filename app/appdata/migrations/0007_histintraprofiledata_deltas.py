@@ -0,0 +1,61 @@
+# Generated by Django 5.0.2 on 2026-10-18 12:00
+
+import django.db.models.deletion
+import hashlib
+import json
+from django.db import migrations, models
+
+
+def backfill_latest_data_hash(apps, schema_editor):
+    """
+    Hashes the latest row of each profile, see appcore.services.json_delta.content_hash
+    Older rows stay full and without hash, they serve as checkpoints.
+    """
+    HistIntraProfileData = apps.get_model("appdata", "HistIntraProfileData")
+    hists = []
+    for hist in HistIntraProfileData.objects.filter(latest_of__isnull=False).iterator(
+        chunk_size=500
+    ):
+        canonical = json.dumps(
+            hist.data, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+        )
+        hist.data_hash = hashlib.sha256(canonical.encode()).hexdigest()
+        hists.append(hist)
+    HistIntraProfileData.objects.bulk_update(hists, ["data_hash"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appdata", "0006_intraprofile_hot_columns_intracursususer"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="histintraprofiledata",
+            name="data",
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="histintraprofiledata",
+            name="data_hash",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+        migrations.AddField(
+            model_name="histintraprofiledata",
+            name="base",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.RESTRICT,
+                related_name="deltas",
+                to="appdata.histintraprofiledata",
+            ),
+        ),
+        migrations.AddField(
+            model_name="histintraprofiledata",
+            name="delta",
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_latest_data_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.2 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appdata", "0007_histintraprofiledata_deltas"),
+    ]
+
+    operations = [
+        # rows stored before keep empty metrics until `manage.py backfill_hist_metrics`
+        # is run after deploy, see apptasks.services.intra_history.backfill_metrics
+        migrations.AddField(
+            model_name="histintraprofiledata",
+            name="metrics",
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddIndex(
+            model_name="histintraprofiledata",
+            index=models.Index(
+                fields=["profile", "created"], name="appdata_hipd_profile_created"
+            ),
+        ),
+    ]
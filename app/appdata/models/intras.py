@@ -1,4 +1,5 @@
 from appcore.models.commons import BaseAutoDate, BaseUUID
+from appcore.services import json_delta
 from django.contrib.postgres.fields import ArrayField
 from django.db import models
 
@@ -13,6 +14,8 @@ class IntraProfile(BaseAutoDate, BaseUUID):
     pool_month: the month the user joined the pool
     pool_year: the year the user joined the pool
     cursus_ids: the cursus IDs the user is in
+    email, first_name, last_name, correction_point: copied from the latest data on ingest
+    latest_data: the latest HistIntraProfileData of the user, maintained on ingest
     """
 
     login = models.CharField(
@@ -27,25 +30,167 @@ class IntraProfile(BaseAutoDate, BaseUUID):
     pool_month = models.CharField(max_length=100, null=True, blank=True)
     pool_year = models.CharField(max_length=100, null=True, blank=True)
     cursus_ids = ArrayField(models.IntegerField(), default=list)
+    email = models.CharField(max_length=255, null=True, blank=True)
+    first_name = models.CharField(max_length=255, null=True, blank=True)
+    last_name = models.CharField(max_length=255, null=True, blank=True)
+    correction_point = models.IntegerField(null=True, blank=True)
+    latest_data = models.OneToOneField(
+        "HistIntraProfileData",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="latest_of",
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["pool_year", "pool_month"],
+                name="appdata_ip_pool",
+            ),
+        ]
 
     def __str__(self):
         return self.login
 
 
+class IntraCursusUser(BaseAutoDate, BaseUUID):
+    """
+    A cursus of an intra profile, copied from the latest data on ingest
+    so cursus reports filter and sort in SQL instead of reading the JSON.
+    One row per (profile, cursus_id), see apptasks.services.update_intraprofile
+    cursus_id: the ID of the cursus, e.g. 21 for 42cursus
+    cursus_slug: the slug of the cursus, e.g. "42cursus"
+    level: the level of the user in the cursus
+    grade: e.g. "Learner", "Member", None for pisciners
+    begin_at: when the user started the cursus
+    blackholed_at: when the user gets blackholed, None if never
+    """
+
+    profile = models.ForeignKey(
+        IntraProfile,
+        on_delete=models.CASCADE,
+        related_name="cursus_users",
+    )
+    cursus_id = models.IntegerField()
+    cursus_slug = models.CharField(max_length=255)
+    level = models.FloatField(default=0)
+    grade = models.CharField(max_length=255, null=True, blank=True)
+    begin_at = models.DateTimeField(null=True, blank=True)
+    blackholed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["profile", "cursus_id"],
+                name="appdata_icu_profile_cursus",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["cursus_id", "blackholed_at"],
+                name="appdata_icu_cursus_bh",
+            ),
+            models.Index(
+                fields=["cursus_id", "-level"],
+                name="appdata_icu_cursus_level",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.profile} - {self.cursus_slug}"
+
+
 class HistIntraProfileData(BaseAutoDate, BaseUUID):
     """
     Stores historical data for a given intra profile, in JSON format.
-    data: exact data returned from the intra API
+    A row is only added when the data changed, see apptasks.services.intra_history
+    data: exact data returned from the intra API, None on delta rows
+    data_hash: content hash of the data, see appcore.services.json_delta
+    base: the full row the delta applies to, None on full rows
+    delta: the changes from base.data, see appcore.services.json_delta
+    metrics: figures of the data kept on every row for time-series, see apptasks.services.intra_history.snapshot_metrics
+    created: when the data was first seen
+    updated: when the data was last seen unchanged
     Note:
         while convienient, JSONField is slow.
-        use HistIntraProfileData.objects.filter(profile=profile).order_by('-created').first() to get the latest data
+        use IntraProfile.latest_data, or filter on latest_of, to get the latest data, it is always full
+        use get_data() on older rows
     """
 
     profile = models.ForeignKey(
         IntraProfile,
         on_delete=models.CASCADE,
     )
-    data = models.JSONField()
+    data = models.JSONField(null=True, blank=True)
+    data_hash = models.CharField(max_length=64, blank=True, default="")
+    base = models.ForeignKey(
+        "self",
+        on_delete=models.RESTRICT,
+        null=True,
+        blank=True,
+        related_name="deltas",
+    )
+    delta = models.JSONField(null=True, blank=True)
+    metrics = models.JSONField(default=dict)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["profile", "created"],
+                name="appdata_hipd_profile_created",
+            ),
+        ]
+
+    def get_data(self) -> dict:
+        """
+        The data of this version, rebuilt from base on delta rows.
+        Use select_related("base") when reading many rows.
+
+        Returns:
+            dict: The data returned from the intra API at the time.
+        """
+        if self.base_id is None:
+            return self.data
+
+        return json_delta.patch(self.base.data, self.delta)
 
     def __str__(self):
         return f"{self.profile} - {self.created}"
+
+
+class CorrectionPointHistoric(BaseAutoDate, BaseUUID):
+    """
+    Ledger of the correction point changes of an intra profile,
+    one row per entry of /users/:id/correction_point_historics.
+    Filled incrementally, see apptasks.services.correction_points
+    intra_id: the ID of the entry in intra
+    reason: e.g. "Earning after defense", "Defense plannification"
+    sum: the points added, negative when spent
+    total: the correction points of the user after this entry
+    scale_team_id: the evaluation the entry comes from, if any
+    intra_created_at: when the entry was created in intra
+    """
+
+    profile = models.ForeignKey(
+        IntraProfile,
+        on_delete=models.CASCADE,
+        related_name="correction_point_historics",
+    )
+    intra_id = models.BigIntegerField(unique=True)
+    reason = models.CharField(max_length=255)
+    sum = models.IntegerField()
+    total = models.IntegerField()
+    scale_team_id = models.IntegerField(null=True, blank=True)
+    intra_created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["profile", "-intra_created_at"],
+                name="appdata_cph_profile_created",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.profile} {self.sum:+d} {self.reason}"
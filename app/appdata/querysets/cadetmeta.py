@@ -1,15 +1,103 @@
+import re
+
+from django.db.models import F, Func, JSONField, Value
+from django.db.models.functions import Coalesce, JSONObject
+
 from appdata.models.intras import HistIntraProfileData
 
+FIELD_PATH_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+# jsonb_build_object takes at most 100 arguments, 2 per path, see project_data
+MAX_FIELD_PATHS = 32
+
+
+class JSONPathQuery(Func):
+    """
+    jsonb_path_query_first / jsonb_path_query_array over a jsonb column, errors silenced
+    """
+
+    template = "%(function)s(%(expressions)s::jsonpath, '{}', true)"
+    output_field = JSONField()
+
+    def __init__(self, function: str, column: str, path: str):
+        super().__init__(F(column), Value(path), function=function)
+
+
+def parse_field_paths(fields: str) -> list[str]:
+    """
+    Parses a comma separated list of dotted paths into the intra data, e.g. "login,cursus_users.level"
+    Args:
+        fields: The paths
+    Returns:
+        list[str]: The paths, without duplicates
+    Raises:
+        ValueError: If a path is not made of dot separated identifiers,
+            or if there are more than MAX_FIELD_PATHS paths
+    """
+    ret = []
+    for path in fields.split(","):
+        path = path.strip()
+        if not FIELD_PATH_RE.match(path):
+            raise ValueError(f"Invalid field path: {path!r}")
+        if path not in ret:
+            ret.append(path)
+    if len(ret) > MAX_FIELD_PATHS:
+        raise ValueError(f"At most {MAX_FIELD_PATHS} field paths, got {len(ret)}")
+
+    return ret
+
+
+def project_data(paths: list[str]) -> JSONObject:
+    """
+    Extracts the given paths from HistIntraProfileData.data in Postgres, keyed by path.
+    A path that leads to one value gives that value,
+    a path through a list, e.g. cursus_users.level, gives the list of matches, [] if missing.
+    """
+    expressions = {}
+    for path in paths:
+        jsonpath = "$" + "".join(f'."{key}"' for key in path.split("."))
+        expressions[path] = Coalesce(
+            JSONPathQuery("jsonb_path_query_first", "data", f"strict {jsonpath}"),
+            JSONPathQuery("jsonb_path_query_array", "data", f"lax {jsonpath}"),
+        )
+
+    return JSONObject(**expressions)
+
+
+def extract_field_path(data: dict, path: str):
+    """
+    Extracts a path from intra data in Python, as project_data does in Postgres.
+    """
+    value = data
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            break
+        value = value[key]
+    else:
+        return value
+
+    # lax: lists along the path are unwrapped, every match is collected
+    values = [data]
+    for key in path.split("."):
+        values = [
+            item[key]
+            for value in values
+            for item in (value if isinstance(value, list) else [value])
+            if isinstance(item, dict) and key in item
+        ]
+
+    return values
+
 
-def query_latest_hist_intra_profile_data():
+def query_latest_hist_intra_profile_data(fields: list[str] | None = None):
     """
     Returns the latest historical intra profile data for each profile
+    Follows IntraProfile.latest_data, so it does not scan the history
+    Args:
+        fields: Only load these paths of the data, see project_data. None for the full data
     """
-    filters = {}
-    qs = (
-        HistIntraProfileData.objects.filter(**filters)
-        .order_by("profile", "-created")
-        .distinct("profile")
-    )
+    filters = {"latest_of__isnull": False}
+    qs = HistIntraProfileData.objects.filter(**filters).order_by("profile")
+    if fields:
+        qs = qs.defer("data", "delta").annotate(projection=project_data(fields))
 
     return qs
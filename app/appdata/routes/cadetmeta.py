@@ -1,9 +1,18 @@
 from ninja import Router
 
+from ninja.decorators import decorate_view
+from ninja.errors import HttpError
 from ninja.pagination import paginate
-from appcore.services.paginate_queryset import PageNumberPaginationExt
+from appcore.services.paginate_queryset import (
+    CursorPagination,
+    PageNumberPaginationExt,
+)
+from appcore.services.response_cache import cached_response
 from appdata.models.cadetmetas import CadetMeta
-from appdata.querysets.cadetmeta import query_latest_hist_intra_profile_data
+from appdata.querysets.cadetmeta import (
+    parse_field_paths,
+    query_latest_hist_intra_profile_data,
+)
 from appdata.serializers.cadetmeta import (
     CadetmetaGetOut,
     CadetmetaPatchIn,
@@ -14,18 +23,52 @@ from appdata.serializers.cadetmeta import (
 router = Router(tags=["cadet-meta"])
 
 
+def _field_paths(fields: str | None) -> list[str] | None:
+    """
+    Parses the `fields` query parameter, see parse_field_paths
+    """
+    if not fields:
+        return None
+    try:
+        return parse_field_paths(fields)
+    except ValueError as e:
+        raise HttpError(400, str(e))
+
+
 @router.get(
     "/latest/",
     response={
         200: list[GetLastestCadetMetaOut],
     },
 )
+@decorate_view(cached_response)
 @paginate(PageNumberPaginationExt, page_size=100)
-def get_latest_cadetmeta(request):
+def get_latest_cadetmeta(request, fields: str = None):
+    """
+    Get the latest cadetmeta of all users\n
+    `fields` only returns the given paths of the data, keyed by path,
+    e.g. `login,cursus_users.level,correction_point`.
+    A path through a list gives the list of matches
+    """
+    return query_latest_hist_intra_profile_data(_field_paths(fields))
+
+
+@router.get(
+    "/latest/cursor/",
+    response={
+        200: list[GetLastestCadetMetaOut],
+    },
+)
+@decorate_view(cached_response)
+@paginate(CursorPagination, ordering=("profile_id", "created"), page_size=100)
+def get_latest_cadetmeta_cursor(request, fields: str = None):
     """
-    Get the latest cadetmeta of all users
+    Get the latest cadetmeta of all users, a page at a time\n
+    Pass the `next` of a page as `cursor` to get the following one, until it is null.
+    `with_total=true` adds the number of users, cached for a few minutes.
+    `fields` works as in /latest/
     """
-    return query_latest_hist_intra_profile_data()
+    return query_latest_hist_intra_profile_data(_field_paths(fields))
 
 
 @router.get(
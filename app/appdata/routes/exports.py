@@ -0,0 +1,58 @@
+"""
+Bulk exports of intra data
+"""
+
+from datetime import datetime
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from ninja import Router
+from ninja.errors import HttpError
+
+from appdata.querysets.cadetmeta import parse_field_paths
+from appdata.services.exports import (
+    CONTENT_TYPES,
+    ExportFormat,
+    aiter_sync,
+    encode_rows,
+    iter_rows,
+    snapshots_queryset,
+)
+
+router = Router(tags=["export"])
+
+
+@router.get("/snapshots/")
+def export_snapshots(
+    request,
+    format: ExportFormat = "ndjson",
+    cursus_id: int = None,
+    pool_month: str = None,
+    pool_year: str = None,
+    as_of: datetime = None,
+    fields: str = None,
+):
+    """
+    Streams the intra data of a cohort in one file, one row per cadet\\n
+    ```
+    format: ndjson | csv | parquet
+    cursus_id, pool_month, pool_year: filters the cohort, on the current profiles
+    as_of: the data as it was at that date, the latest by default
+    fields: only these paths of the data, as in /cadetmeta/latest/
+    ```
+    Rows have login, intra_id and snapshot_created, then the data or its fields.
+    In csv and parquet, nested values are JSON strings.
+    """
+    try:
+        paths = parse_field_paths(fields) if fields else None
+    except ValueError as e:
+        raise HttpError(400, str(e))
+    qs = snapshots_queryset(paths, cursus_id, pool_month, pool_year, as_of)
+    parts = encode_rows(iter_rows(qs, paths), paths, format)
+
+    response = StreamingHttpResponse(
+        aiter_sync(parts), content_type=CONTENT_TYPES[format]
+    )
+    fname = f"snapshots_{(as_of or timezone.now()).date()}.{format}"
+    response["Content-Disposition"] = f'attachment; filename="{fname}"'
+    return response
@@ -2,17 +2,37 @@
 Aggregates intra data
 """
 
+from datetime import datetime
 from typing import Literal
-from django.utils import timezone
-from dateutil.parser import isoparse
+from uuid import UUID
+from django.db.models.fields.json import KeyTransform
+from django.db.models.functions import Trunc
 from ninja import Router
+from ninja.decorators import decorate_view
+from ninja.errors import HttpError
+from ninja.pagination import paginate
 
-from appdata.models.intras import HistIntraProfileData
-from appdata.serializers.intra import CadetStatusGetOut
+from appcore.services.paginate_queryset import PageNumberPaginationExt
+from appcore.services.response_cache import cached_response
+from appdata.services.cadet_status import resolve_cadet_statuses
+from appdata.models.intras import HistIntraProfileData, IntraProfile
+from appdata.serializers.intra import (
+    CadetStatusesPostIn,
+    CadetStatusesPostOut,
+    CadetStatusGetOut,
+    IntraHistoryPointOut,
+    IntraSnapshotGetOut,
+    IntraSnapshotOut,
+)
 
 router = Router(tags=["intra-data"])
 
+# the figures in HistIntraProfileData.metrics, level and blackholed_at are per cursus
+HISTORY_METRICS = ["level", "blackholed_at", "correction_point", "validated_projects"]
+CURSUS_METRICS = ["level", "blackholed_at"]
+
 
+# not cached: blackholed depends on the time of the request, not only on the synced data
 @router.get(
     "user/{login}/status/",
     response={200: CadetStatusGetOut, 404: None},
@@ -25,55 +45,125 @@ def get_cadet_status(request, login: str):
     enrollment: cadet | pisciner | no-cursus
     ```
     """
+    ret = resolve_cadet_statuses([login]).get(login)
+
+    if ret is None:
+        return 404, None
 
-    def _is_blackholed(data) -> bool:
-        """
-        Checks if the cadet's 42cursus is blackholed
-        Args:
-            data: The intra profile data
-        Returns:
-            bool: True if blackholed in 42cursus, False otherwise
-        """
-        for cursus in data["cursus_users"]:
-            if cursus["cursus"]["slug"] == "42cursus":
-                if cursus["blackholed_at"] is None:
-                    return False
-                return timezone.now() > isoparse(cursus["blackholed_at"])
-
-        return False
-
-    def _resolve_enrollment(data) -> Literal["cadet", "pisciner", "no-cursus"]:
-        """
-        Resolves the enrollment status of the cadet
-        Args:
-            data: The intra profile data
-        Returns:
-            str: The enrollment status of the cadet
-        """
-        if len(data["cursus_users"]) == 0:
-            return "no-cursus"
-
-        for cursus in data["cursus_users"]:
-            if cursus["cursus"]["slug"] == "42cursus":
-                return "cadet"
-
-        return "pisciner"
+    return 200, ret
 
-    q = (
+
+@router.post(
+    "users/status/",
+    response={200: CadetStatusesPostOut},
+)
+def post_cadet_statuses(request, payload: CadetStatusesPostIn):
+    """
+    Resolves the cadet status of many logins at once, see user/{login}/status/\n
+    Logins without intra data are listed in `not_found`
+    """
+    statuses = resolve_cadet_statuses(payload.logins)
+    ret = {
+        "statuses": statuses,
+        "not_found": [login for login in payload.logins if login not in statuses],
+    }
+
+    return 200, ret
+
+
+@router.get(
+    "user/{login}/snapshots/",
+    response={200: list[IntraSnapshotOut]},
+)
+@decorate_view(cached_response)
+@paginate(PageNumberPaginationExt, page_size=100)
+def get_cadet_snapshots(request, login: str):
+    """
+    Lists the stored versions of the intra data of the given login, latest first\n
+    A version is only stored when the data changed,
+    `updated` is the last time it was seen unchanged
+    """
+    return (
         HistIntraProfileData.objects.filter(profile__login=login)
+        .defer("data", "delta", "metrics")
         .order_by("-created")
+    )
+
+
+@router.get(
+    "user/{login}/snapshots/{snapshot_id}/",
+    response={200: IntraSnapshotGetOut, 404: None},
+)
+@decorate_view(cached_response)
+def get_cadet_snapshot(request, login: str, snapshot_id: UUID):
+    """
+    Gets a stored version of the intra data of the given login, rebuilt in full
+    """
+    q = (
+        HistIntraProfileData.objects.filter(profile__login=login, pk=snapshot_id)
+        .select_related("base")
         .first()
     )
 
     if q is None:
         return 404, None
 
-    data = q.data
+    return 200, q
 
-    ret = {
-        "updated": q.created,
-        "blackholed": _is_blackholed(data),
-        "enrollment": _resolve_enrollment(data),
-    }
 
-    return 200, ret
+@router.get(
+    "user/{login}/history/",
+    response={200: list[IntraHistoryPointOut], 404: None},
+)
+@decorate_view(cached_response)
+def get_cadet_history(
+    request,
+    login: str,
+    bucket: Literal["day", "week", "month"] = "day",
+    metrics: str = None,
+    cursus_id: int = None,
+    since: datetime = None,
+    until: datetime = None,
+):
+    """
+    Time-series of the given login, one point per bucket, oldest first\n
+    ```
+    bucket: day | week | month
+    metrics: comma separated, among level, blackholed_at, correction_point, validated_projects. All by default
+    cursus_id: level and blackholed_at of this cursus only, keyed by cursus_id otherwise
+    since, until: bounds of the series
+    ```
+    A point holds the last values seen in its bucket.
+    Values are only stored when they change, buckets without change are left out,
+    the previous point still holds.
+    """
+    names = metrics.split(",") if metrics else HISTORY_METRICS
+    if unknown := set(names) - set(HISTORY_METRICS):
+        raise HttpError(400, f"Unknown metrics: {', '.join(sorted(unknown))}")
+
+    profile_id = (
+        IntraProfile.objects.filter(login=login).values_list("pk", flat=True).first()
+    )
+
+    if profile_id is None:
+        return 404, None
+
+    columns = {}
+    for name in names:
+        columns[name] = KeyTransform(name, "metrics")
+        if cursus_id is not None and name in CURSUS_METRICS:
+            columns[name] = KeyTransform(str(cursus_id), columns[name])
+    qs = HistIntraProfileData.objects.filter(profile_id=profile_id)
+    if since:
+        qs = qs.filter(created__gte=since)
+    if until:
+        qs = qs.filter(created__lte=until)
+    # last row of each bucket, over the (profile, created) index
+    qs = (
+        qs.annotate(time=Trunc("created", bucket))
+        .order_by("time", "-created")
+        .distinct("time")
+        .values("time", **columns)
+    )
+
+    return 200, list(qs)
@@ -22,4 +22,11 @@ class CadetmetaPatchIn(ModelSchema):
 class GetLastestCadetMetaOut(ModelSchema):
     class Meta:
         model = HistIntraProfileData
-        fields = "__all__"
+        exclude = ["base", "delta", "metrics", "data_hash"]
+
+    @staticmethod
+    def resolve_data(obj) -> dict:
+        # only the asked paths, see appdata.querysets.cadetmeta.project_data
+        if hasattr(obj, "projection"):
+            return obj.projection
+        return obj.data
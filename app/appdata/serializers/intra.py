@@ -1,9 +1,49 @@
 import datetime
 from typing import Literal
-from ninja import Schema
+from uuid import UUID
+from ninja import Field, Schema
+
+from appdata.services.cadet_status import MAX_LOGINS
 
 
 class CadetStatusGetOut(Schema):
     updated: datetime.datetime
     blackholed: bool
     enrollment: Literal["cadet", "pisciner", "no-cursus"]
+
+
+class CadetStatusesPostIn(Schema):
+    logins: list[str] = Field(..., max_length=MAX_LOGINS)
+
+
+class CadetStatusesPostOut(Schema):
+    statuses: dict[str, CadetStatusGetOut]
+    not_found: list[str]
+
+
+class IntraSnapshotOut(Schema):
+    id: UUID
+    created: datetime.datetime
+    updated: datetime.datetime
+    data_hash: str
+    full: bool
+
+    @staticmethod
+    def resolve_full(obj) -> bool:
+        return obj.base_id is None
+
+
+class IntraSnapshotGetOut(IntraSnapshotOut):
+    data: dict
+
+    @staticmethod
+    def resolve_data(obj) -> dict:
+        return obj.get_data()
+
+
+class IntraHistoryPointOut(Schema):
+    time: datetime.datetime
+    level: float | dict[str, float] | None = None
+    blackholed_at: datetime.datetime | dict[str, datetime.datetime | None] | None = None
+    correction_point: int | None = None
+    validated_projects: int | None = None
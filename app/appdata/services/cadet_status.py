@@ -0,0 +1,59 @@
+"""
+Cadet status for the pedago usage, resolved for many logins in one query.
+
+Reads the IntraCursusUser rows kept by ingest, not the latest data JSON.
+"""
+
+from typing import Iterable, Literal
+
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from appdata.models.intras import IntraProfile
+
+CADET_CURSUS_SLUG = "42cursus"
+# logins per request of the batch endpoint
+MAX_LOGINS = 5000
+
+
+def _enrollment(
+    n_cursus: int, n_cadet_cursus: int
+) -> Literal["cadet", "pisciner", "no-cursus"]:
+    if n_cursus == 0:
+        return "no-cursus"
+    if n_cadet_cursus:
+        return "cadet"
+
+    return "pisciner"
+
+
+def resolve_cadet_statuses(logins: Iterable[str]) -> dict[str, dict]:
+    """
+    Resolves the status of each login with a single aggregate query.
+    Args:
+        logins: The logins to resolve
+    Returns:
+        dict[str, dict]: updated, blackholed and enrollment keyed by login,
+            logins without intra data are left out.
+    """
+    in_cadet_cursus = Q(cursus_users__cursus_slug=CADET_CURSUS_SLUG)
+    rows = (
+        IntraProfile.objects.filter(login__in=list(logins), latest_data__isnull=False)
+        .values("login", "latest_data__updated")
+        .annotate(
+            n_cursus=Count("cursus_users"),
+            n_cadet_cursus=Count("cursus_users", filter=in_cadet_cursus),
+            blackholed_at=Max("cursus_users__blackholed_at", filter=in_cadet_cursus),
+        )
+    )
+    now = timezone.now()
+
+    return {
+        row["login"]: {
+            "updated": row["latest_data__updated"],
+            "blackholed": row["blackholed_at"] is not None
+            and now > row["blackholed_at"],
+            "enrollment": _enrollment(row["n_cursus"], row["n_cadet_cursus"]),
+        }
+        for row in rows
+    }
@@ -0,0 +1,220 @@
+"""
+Bulk export of cohort snapshots, streamed in NDJSON, CSV or Parquet.
+
+Rows are read with a server-side cursor and encoded EXPORT_CHUNK_SIZE at a
+time, so a full-campus export runs in constant memory.
+
+Usage:
+    qs = snapshots_queryset(fields, cursus_id=21)
+    for part in encode_rows(iter_rows(qs, fields), fields, "csv"):
+        ...
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Iterable, Iterator, Literal
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+from appdata.models.intras import HistIntraProfileData
+from appdata.querysets.cadetmeta import extract_field_path, project_data
+
+ExportFormat = Literal["ndjson", "csv", "parquet"]
+CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+EXPORT_CHUNK_SIZE = 500
+# leading columns of every row, followed by the data or its fields
+ROW_COLUMNS = ["login", "intra_id", "snapshot_created"]
+
+
+def snapshots_queryset(
+    fields: list[str] | None = None,
+    cursus_id: int | None = None,
+    pool_month: str | None = None,
+    pool_year: str | None = None,
+    as_of: datetime | None = None,
+):
+    """
+    The snapshot of each profile of the cohort, the latest one or the one valid at `as_of`.
+    The fields of the latest snapshots are projected in Postgres, see project_data,
+    older snapshots are rebuilt from their base and projected by iter_rows.
+    Args:
+        fields: Only export these paths of the data, None for the full data
+        cursus_id, pool_month, pool_year: Filters on the current IntraProfile
+        as_of: None for the latest snapshot
+    """
+    if as_of is None:
+        qs = HistIntraProfileData.objects.filter(latest_of__isnull=False)
+        if fields:
+            qs = qs.defer("data", "delta").annotate(projection=project_data(fields))
+    else:
+        qs = (
+            HistIntraProfileData.objects.filter(created__lte=as_of)
+            .select_related("base")
+            .order_by("profile", "-created")
+            .distinct("profile")
+        )
+    if cursus_id is not None:
+        qs = qs.filter(profile__cursus_ids__contains=[cursus_id])
+    if pool_month:
+        qs = qs.filter(profile__pool_month=pool_month)
+    if pool_year:
+        qs = qs.filter(profile__pool_year=pool_year)
+
+    return qs.annotate(login=F("profile__login"), intra_id=F("profile__intra_id"))
+
+
+def iter_rows(qs, fields: list[str] | None = None) -> Iterator[dict]:
+    """
+    The rows of the export, the data of each snapshot or only the given paths of it.
+    Args:
+        qs: From snapshots_queryset, with the same fields
+    """
+    for hist in qs.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        row = {
+            "login": hist.login,
+            "intra_id": hist.intra_id,
+            "snapshot_created": hist.created,
+        }
+        if not fields:
+            row["data"] = hist.get_data()
+        elif hasattr(hist, "projection"):
+            row.update(hist.projection)
+        else:
+            data = hist.get_data()
+            row.update({path: extract_field_path(data, path) for path in fields})
+        yield row
+
+
+def _chunks(rows: Iterable[dict]) -> Iterator[list[dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == EXPORT_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _cell(value) -> str | None:
+    """
+    Flat cell of a CSV or Parquet row, nested values as JSON
+    """
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, datetime):
+        return value.isoformat()
+
+    return json.dumps(value)
+
+
+def _encode_ndjson(rows: Iterable[dict], columns: list[str]) -> Iterator[bytes]:
+    for chunk in _chunks(rows):
+        yield "".join(
+            json.dumps(row, cls=DjangoJSONEncoder) + "\n" for row in chunk
+        ).encode()
+
+
+def _encode_csv(rows: Iterable[dict], columns: list[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for chunk in _chunks(rows):
+        writer.writerows([[_cell(row[c]) for c in columns] for row in chunk])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _ParquetSink(io.RawIOBase):
+    """
+    Write-only file collecting what the Parquet writer outputs, drained after each row group
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._parts.append(bytes(b))
+        self._position += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        ret = b"".join(self._parts)
+        self._parts = []
+        return ret
+
+
+def _encode_parquet(rows: Iterable[dict], columns: list[str]) -> Iterator[bytes]:
+    """
+    One row group per chunk, the data columns as strings, see _cell.
+    pyarrow is only imported when a Parquet export is asked.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    typed = {"intra_id": pa.int64(), "snapshot_created": pa.timestamp("us", tz="UTC")}
+    schema = pa.schema([(c, typed.get(c, pa.string())) for c in columns])
+    sink = _ParquetSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for chunk in _chunks(rows):
+            table = pa.Table.from_pydict(
+                {
+                    c: [row[c] if c in typed else _cell(row[c]) for row in chunk]
+                    for c in columns
+                },
+                schema=schema,
+            )
+            writer.write_table(table)
+            yield sink.drain()
+    yield sink.drain()
+
+
+ENCODERS = {
+    "ndjson": _encode_ndjson,
+    "csv": _encode_csv,
+    "parquet": _encode_parquet,
+}
+
+
+def encode_rows(
+    rows: Iterable[dict], fields: list[str] | None, format: ExportFormat
+) -> Iterator[bytes]:
+    """
+    Encodes the rows of iter_rows in the given format, a chunk of rows at a time.
+    Returns:
+        Iterator[bytes]: The parts of the file
+    """
+    columns = ROW_COLUMNS + (fields or ["data"])
+
+    return ENCODERS[format](rows, columns)
+
+
+async def aiter_sync(iterator: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Async iterator over a sync one, advanced in the thread of the database connection.
+    The ASGI handler would otherwise load a sync StreamingHttpResponse in memory.
+    """
+    done = object()
+    while True:
+        part = await sync_to_async(next, thread_sensitive=True)(iterator, done)
+        if part is done:
+            break
+        yield part
@@ -1,3 +1,97 @@
-from django.test import TestCase
+from django.db.models.functions import Coalesce
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from appdata.querysets.cadetmeta import (
+    MAX_FIELD_PATHS,
+    extract_field_path,
+    parse_field_paths,
+    project_data,
+    query_latest_hist_intra_profile_data,
+)
+
+DATA = {
+    "login": "cadet",
+    "location": None,
+    "image": {"link": "x.png", "versions": {"small": "s.png"}},
+    "cursus_users": [
+        {"level": 1.5, "cursus": {"slug": "c-piscine"}},
+        {"level": 7.2, "cursus": {"slug": "42cursus"}, "skills": [{"id": 1}]},
+    ],
+    "projects_users": [[{"id": 1}, {"id": 2}], {"id": 3}],
+}
+
+
+class FieldPathTests(SimpleTestCase):
+    def test_parse_field_paths(self):
+        self.assertEqual(
+            parse_field_paths(" login,cursus_users.level ,login"),
+            ["login", "cursus_users.level"],
+        )
+        for fields in ["", "login,", "a..b", ".a", "a.", "1a", "a-b", "a.b[0]", "$.a"]:
+            with self.subTest(fields), self.assertRaises(ValueError):
+                parse_field_paths(fields)
+
+    def test_parse_field_paths_cap(self):
+        paths = [f"f{i}" for i in range(MAX_FIELD_PATHS)]
+        self.assertEqual(parse_field_paths(",".join(paths + paths)), paths)
+        with self.assertRaises(ValueError):
+            parse_field_paths(",".join(paths + ["extra"]))
+
+    def test_extract_strict(self):
+        # the value itself when the path only goes through objects, as `strict` does
+        self.assertEqual(extract_field_path(DATA, "login"), "cadet")
+        self.assertEqual(extract_field_path(DATA, "image.versions.small"), "s.png")
+        self.assertEqual(extract_field_path(DATA, "image.versions"), {"small": "s.png"})
+        self.assertEqual(extract_field_path(DATA, "cursus_users"), DATA["cursus_users"])
+        # json null is a value, Coalesce only falls back on a missing path
+        self.assertIsNone(extract_field_path(DATA, "location"))
+
+    def test_extract_lax(self):
+        # every match once a list is on the path, as `lax` does
+        self.assertEqual(extract_field_path(DATA, "cursus_users.level"), [1.5, 7.2])
+        self.assertEqual(
+            extract_field_path(DATA, "cursus_users.cursus.slug"),
+            ["c-piscine", "42cursus"],
+        )
+        self.assertEqual(extract_field_path(DATA, "cursus_users.skills.id"), [1])
+        # one level of list is unwrapped per key, as in Postgres
+        self.assertEqual(extract_field_path(DATA, "projects_users.id"), [3])
+
+    def test_extract_missing(self):
+        for path in ["missing", "image.missing", "login.length", "location.x"]:
+            with self.subTest(path):
+                self.assertEqual(extract_field_path(DATA, path), [])
+
+    def test_project_data_jsonpaths(self):
+        projection = project_data(["login", "cursus_users.level"])
+        # JSONObject arguments alternate the key and its expression
+        args = projection.get_source_expressions()
+        self.assertEqual(
+            [key.value for key in args[::2]], ["login", "cursus_users.level"]
+        )
+        jsonpaths = []
+        for expression in args[1::2]:
+            self.assertIsInstance(expression, Coalesce)
+            first, array = expression.get_source_expressions()
+            self.assertEqual(first.extra["function"], "jsonb_path_query_first")
+            self.assertEqual(array.extra["function"], "jsonb_path_query_array")
+            jsonpaths.append(
+                [query.get_source_expressions()[1].value for query in (first, array)]
+            )
+        self.assertEqual(
+            jsonpaths,
+            [
+                ['strict $."login"', 'lax $."login"'],
+                ['strict $."cursus_users"."level"', 'lax $."cursus_users"."level"'],
+            ],
+        )
+
+    def test_project_data_sql(self):
+        qs = query_latest_hist_intra_profile_data(["cursus_users.level"])
+        sql, params = qs.query.sql_with_params()
+        self.assertIn(
+            'jsonb_path_query_first("appdata_histintraprofiledata"."data", %s::jsonpath, \'{}\', true)',
+            sql,
+        )
+        self.assertIn('strict $."cursus_users"."level"', params)
+        self.assertIn('lax $."cursus_users"."level"', params)
@@ -1,7 +1,11 @@
 from ninja import Router
 from appcore.services.auths import ServiceBearerTokenAuth
 from apptasks.routes.tasks import router as snappy_router
+from apptasks.routes.intra_metrics import router as intra_metrics_router
 
 
 router = Router()
 router.add_router("/tasks", snappy_router, auth=ServiceBearerTokenAuth())
+router.add_router(
+    "/intra-metrics", intra_metrics_router, auth=ServiceBearerTokenAuth()
+)
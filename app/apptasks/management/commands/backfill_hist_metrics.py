@@ -0,0 +1,16 @@
+from apptasks.services.intra_history import backfill_metrics
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the metrics of intra snapshots stored before they existed. "
+        "Safe to run while serving and to interrupt, filled rows are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        filled = backfill_metrics(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Filled the metrics of {filled} rows."))
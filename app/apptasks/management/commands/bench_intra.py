@@ -0,0 +1,83 @@
+import json
+from dataclasses import asdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apptasks.services.bench_intra import SCENARIOS, compare, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark update_intraprofile, snap_to_gsheet and socialism against a local fake Intra API. "
+        "Runs in a test database, as the test runner does, the real data is left alone."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "scenarios",
+            nargs="*",
+            help=f"Scenarios to run, among {', '.join(SCENARIOS)}. All by default.",
+        )
+        parser.add_argument("--cadets", type=int, default=500)
+        parser.add_argument(
+            "--latency", type=float, default=0.02, help="Seconds per response."
+        )
+        parser.add_argument(
+            "--rate-429", type=float, default=0, help="Share of requests throttled."
+        )
+        parser.add_argument(
+            "--retry-after", type=float, default=1, help="Retry-After of the 429s."
+        )
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument(
+            "--rate-limit",
+            action="store_true",
+            help="Keep the INTRA_API rate limits instead of measuring the client alone.",
+        )
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Keep the test database between runs, as test --keepdb.",
+        )
+        parser.add_argument("--json", help="Write the results to this file.")
+        parser.add_argument(
+            "--baseline", help="Fail if slower or hungrier than this results file."
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Allowed growth over the baseline, 0.2 for 20%%.",
+        )
+
+    def handle(self, *args, **options):
+        if unknown := set(options["scenarios"]) - set(SCENARIOS):
+            raise CommandError(f"Unknown scenarios: {', '.join(unknown)}")
+        results = run_benchmarks(
+            options["scenarios"] or list(SCENARIOS),
+            repeat=options["repeat"],
+            rate_limit=options["rate_limit"],
+            keepdb=options["keepdb"],
+            log=self.stdout.write,
+            cadets=options["cadets"],
+            latency=options["latency"],
+            rate_429=options["rate_429"],
+            retry_after=options["retry_after"],
+        )
+
+        self.stdout.write(
+            f"{'scenario':<22}{'wall_s':>9}{'min_s':>9}{'requests':>10}{'429s':>7}{'peak_mib':>10}"
+        )
+        for r in results:
+            self.stdout.write(
+                f"{r.scenario:<22}{r.wall_s:>9.2f}{r.wall_s_min:>9.2f}{r.requests:>10}{r.throttled:>7}{r.peak_mib:>10.1f}"
+            )
+        if options["json"]:
+            with open(options["json"], "w") as f:
+                json.dump([asdict(r) for r in results], f, indent=2)
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                regressions = compare(results, json.load(f), options["tolerance"])
+            if regressions:
+                raise CommandError("Regressions:\n" + "\n".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regression."))
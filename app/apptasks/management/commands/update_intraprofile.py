@@ -1,3 +1,4 @@
+from appcore.services.intra.instruments import intra_run
 from apptasks.services.update_intraprofile import update_intraprofile
 from django.core.management.base import BaseCommand
 
@@ -5,5 +6,13 @@ from django.core.management.base import BaseCommand
 class Command(BaseCommand):
     help = "Manually update intra profile of all cadets."
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Fetch every cadet instead of only those changed since the last sync.",
+        )
+
     def handle(self, *args, **options):
-        update_intraprofile()
+        with intra_run("manual:update_intraprofile"):
+            update_intraprofile(full=True if options["full"] else None)
@@ -0,0 +1,47 @@
+"""
+Intra API usage recorded per task run, see appcore.services.intra.instruments
+"""
+
+from ninja import Router
+
+from appcore.services.intra.instruments import list_runs, read_run
+from apptasks.serializers.intra_metrics import (
+    IntraMetricsRunGetOut,
+    IntraMetricsRunsGetOut,
+)
+
+router = Router(tags=["intra-metrics"])
+
+
+@router.get(
+    "/",
+    response={200: IntraMetricsRunsGetOut},
+)
+def get_intra_metrics_runs(request, limit: int = 50):
+    """
+    Get the most recent runs, latest first
+    Query Parameters:
+    - limit: int (optional) - Number of runs, defaults to 50
+    """
+
+    return {"items": list_runs(limit)}
+
+
+@router.get(
+    "/{run_id}/",
+    response={200: IntraMetricsRunGetOut, 404: None},
+)
+def get_intra_metrics_run(request, run_id: str):
+    """
+    Get the Intra API figures of one run, per endpoint\n
+    ```
+    endpoints: keyed by "{method} {endpoint template}", e.g. "GET /users/:id"
+    latency_ms_buckets: attempts per latency upper bound in ms, "inf" above the last one
+    ```
+    """
+
+    run = read_run(run_id)
+    if run is None:
+        return 404, None
+
+    return run
@@ -0,0 +1,29 @@
+from ninja import Schema
+
+
+class IntraMetricsRunSchema(Schema):
+    id: str
+    name: str
+    started: float | None
+    finished: float | None
+
+
+class IntraMetricsRunsGetOut(Schema):
+    items: list[IntraMetricsRunSchema]
+
+
+class IntraEndpointMetricsSchema(Schema):
+    requests: int
+    retries: int
+    bytes: int
+    statuses: dict[str, int]
+    latency_ms_sum: float
+    latency_ms_avg: float
+    latency_ms_buckets: dict[str, int]
+
+
+class IntraMetricsRunGetOut(IntraMetricsRunSchema):
+    requests: int
+    retries: int
+    bytes: int
+    endpoints: dict[str, IntraEndpointMetricsSchema]
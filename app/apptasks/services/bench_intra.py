@@ -0,0 +1,284 @@
+"""
+Benchmarks the Intra sync pipeline against the fake Intra API.
+
+Runs the real update_intraprofile, snap_to_gsheet and socialism code with the
+Intra base URL pointed at appcore.services.intra.fake_server, and reports
+wall-clock, requests served and peak Python memory of each.
+
+The scenarios run in a test database of their own, created for the occasion,
+and every run is rolled back so repeats start from the same rows. Their cache
+keys (access token, sync markers, rate limit buckets, response cache generation)
+are kept apart from the real ones and cleared before every run.
+"""
+
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+from dataclasses import asdict, dataclass
+from typing import Callable
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.test import override_settings
+from django.test.utils import setup_databases, teardown_databases
+from django_redis import get_redis_connection
+
+from appcore.services import response_cache
+from appcore.services.intra import ratelimits, tokens
+from appcore.services.intra.async_intra import AsyncIntra
+from appcore.services.intra.fake_server import FakeIntraServer
+from appcore.services.intra.instruments import intra_run
+from appcore.services.intra.intra import Intra
+from apptasks.models.configs import DiscordWebhook
+from apptasks.services import socialisms
+from apptasks.services import update_intraprofile as update_intraprofile_service
+from apptasks.tasks import snappy
+
+KEY_PREFIX = "bench-intra"
+# update_intraprofile state, reset before every run
+SYNC_KEYS = {
+    "LAST_SYNC_KEY": f"{KEY_PREFIX}:last-sync",
+    "LAST_FULL_SYNC_KEY": f"{KEY_PREFIX}:last-full-sync",
+    "FAILED_LOGINS_KEY": f"{KEY_PREFIX}:failed-logins",
+}
+
+
+@dataclass
+class BenchResult:
+    """
+    Figures of one scenario.
+    wall_s: median wall-clock of the timed runs, in seconds
+    wall_s_min: fastest timed run, in seconds
+    requests: requests served by the fake API in one run, 429s included
+    throttled: 429s injected in one run
+    peak_mib: peak Python memory of one run, measured in a separate traced run
+    """
+
+    scenario: str
+    wall_s: float
+    wall_s_min: float
+    requests: int
+    throttled: int
+    peak_mib: float
+
+
+def _update_intraprofile():
+    update_intraprofile_service.update_intraprofile(full=True)
+
+
+def _snap_to_gsheet():
+    with (
+        patch.object(snappy, "upload2gsheet"),
+        patch.object(snappy, "upload2gsheet_static"),
+    ):
+        snappy.snap_to_gsheet(
+            cursus_id=21, sheet_name_static="bench", sheet_name="bench"
+        )
+
+
+def _socialism():
+    DiscordWebhook.objects.get_or_create(
+        name="socialism", defaults={"url": "http://127.0.0.1/bench"}
+    )
+    with patch.object(socialisms, "announce"):
+        socialisms.socialism(target=10, dry_run=False)
+
+
+# scenario name: (run, needs the fake cadets ingested first)
+SCENARIOS: dict[str, tuple[Callable[[], None], bool]] = {
+    "update_intraprofile": (_update_intraprofile, False),
+    "snap_to_gsheet": (_snap_to_gsheet, True),
+    "socialism": (_socialism, False),
+}
+
+
+@contextmanager
+def _test_database(keepdb: bool):
+    """
+    Runs the block against a migrated test database, as the test runner does,
+    so only the fake cadets are there and the real data is never touched.
+    """
+    old_config = setup_databases(verbosity=0, interactive=False, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0, keepdb=keepdb)
+
+
+@contextmanager
+def _rolled_back():
+    """
+    The database work done inside is rolled back, to a savepoint when nested.
+    """
+    with transaction.atomic():
+        try:
+            yield
+        finally:
+            transaction.set_rollback(True)
+
+
+def _clear_bench_keys() -> None:
+    """
+    Drops the sync markers and rate limit buckets left by a previous run.
+    """
+    cache.delete_many(list(SYNC_KEYS.values()))
+    get_redis_connection("default").delete(
+        f"{KEY_PREFIX}:ratelimit:second", f"{KEY_PREFIX}:ratelimit:hour"
+    )
+
+
+@contextmanager
+def _against(server: FakeIntraServer, rate_limit: bool):
+    """
+    Points the Intra clients at the fake server, with cache keys of their own.
+    """
+    intra_api = dict(settings.INTRA_API)
+    if not rate_limit:
+        intra_api.update(RATE_LIMIT_PER_SECOND=None, RATE_LIMIT_PER_HOUR=None)
+
+    with ExitStack() as stack:
+        stack.enter_context(patch.object(Intra, "BASE", server.base))
+        stack.enter_context(patch.object(AsyncIntra, "BASE", server.base))
+        stack.enter_context(
+            patch.multiple(
+                tokens,
+                CACHE_KEY=f"{KEY_PREFIX}:access-token",
+                LOCK_KEY=f"{KEY_PREFIX}:access-token:lock",
+                _token=None,
+                _expires_at=0,
+            )
+        )
+        stack.enter_context(
+            patch.object(ratelimits, "KEY_PREFIX", f"{KEY_PREFIX}:ratelimit")
+        )
+        stack.enter_context(
+            patch.object(
+                response_cache,
+                "DATA_GENERATION_KEY",
+                f"{KEY_PREFIX}:data-generation",
+            )
+        )
+        stack.enter_context(patch.multiple(update_intraprofile_service, **SYNC_KEYS))
+        stack.enter_context(override_settings(INTRA_API=intra_api))
+        stack.callback(_clear_bench_keys)
+        stack.callback(
+            cache.delete_many,
+            [f"{KEY_PREFIX}:access-token", f"{KEY_PREFIX}:data-generation"],
+        )
+        yield
+
+
+def _run(name: str, fn: Callable[[], None], server: FakeIntraServer, traced: bool):
+    """
+    Runs one scenario once, from the same database rows and cache keys every time.
+
+    Returns:
+        tuple[float, dict, int]: Wall-clock in seconds, server stats, peak bytes (0 if not traced).
+    """
+    server.reset()
+    _clear_bench_keys()
+    if traced:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        with _rolled_back(), intra_run(f"bench:{name}"):
+            fn()
+    finally:
+        wall = time.perf_counter() - started
+        peak = 0
+        if traced:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    return wall, server.stats(), peak
+
+
+def run_benchmarks(
+    scenarios: list[str],
+    repeat: int = 3,
+    rate_limit: bool = False,
+    keepdb: bool = False,
+    log: Callable[[str], None] = print,
+    **server_kwargs,
+) -> list[BenchResult]:
+    """
+    Runs the scenarios against a fresh fake Intra API, in a test database.
+    Each scenario is timed `repeat` times, then run once more under tracemalloc
+    for its peak memory, so tracing does not slow the timed runs.
+
+    Args:
+        scenarios (list[str]): Names from SCENARIOS, run in that order.
+        repeat (int, optional): Timed runs per scenario.
+        rate_limit (bool, optional): Keep the INTRA_API rate limits. Defaults to False, measuring the client alone.
+        keepdb (bool, optional): Keep the test database between invocations, as `test --keepdb`.
+        log (Callable[[str], None], optional): Progress output.
+        **server_kwargs: Passed to FakeIntraServer, e.g. cadets, latency, rate_429.
+
+    Returns:
+        list[BenchResult]: One per scenario.
+    """
+    ret = []
+    with (
+        _test_database(keepdb),
+        FakeIntraServer(**server_kwargs) as server,
+        _against(server, rate_limit),
+        # leaves a kept test database empty, each run rolls back to a savepoint inside
+        _rolled_back(),
+    ):
+        ingested = False
+        for name in scenarios:
+            fn, needs_ingest = SCENARIOS[name]
+            if needs_ingest and not ingested:
+                log("Ingesting the fake cadets...")
+                _clear_bench_keys()
+                _update_intraprofile()
+                ingested = True
+
+            walls = []
+            for i in range(repeat):
+                wall, stats, _ = _run(name, fn, server, traced=False)
+                walls.append(wall)
+                log(f"{name} #{i + 1}: {wall:.2f}s, {stats['requests']} requests")
+            _, _, peak = _run(name, fn, server, traced=True)
+            ret.append(
+                BenchResult(
+                    scenario=name,
+                    wall_s=round(statistics.median(walls), 3),
+                    wall_s_min=round(min(walls), 3),
+                    requests=stats["requests"],
+                    throttled=stats["throttled"],
+                    peak_mib=round(peak / 2**20, 1),
+                )
+            )
+
+    return ret
+
+
+def compare(
+    results: list[BenchResult], baseline: list[dict], tolerance: float
+) -> list[str]:
+    """
+    Compares results with a previous run.
+
+    Args:
+        results (list[BenchResult]): The current figures.
+        baseline (list[dict]): The figures of a previous run, as written by asdict.
+        tolerance (float): Allowed growth, 0.2 for 20%.
+
+    Returns:
+        list[str]: One line per regression, empty if none.
+    """
+    baseline = {b["scenario"]: b for b in baseline}
+    ret = []
+    for result in results:
+        if (before := baseline.get(result.scenario)) is None:
+            continue
+        for metric in ("wall_s", "requests", "peak_mib"):
+            now, then = asdict(result)[metric], before[metric]
+            if then and now > then * (1 + tolerance):
+                ret.append(f"{result.scenario} {metric}: {then} -> {now}")
+
+    return ret
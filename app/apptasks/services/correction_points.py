@@ -0,0 +1,125 @@
+"""
+Correction point ledger, see appdata.models.intras.CorrectionPointHistoric
+
+The history of each cadet is fetched once, then only the entries created since
+the last stored one.
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Iterable
+
+from dateutil.parser import isoparse
+from django.db.models import OuterRef, Q, Subquery, Sum
+
+from appcore.services.console import console
+from appcore.services.intra.async_intra import AsyncIntra
+from appcore.services.intra.bulk import BulkFetchResult
+from appcore.services.intra.cohorts import EARNING_REASON, SPENDING_REASON
+from appdata.models.intras import CorrectionPointHistoric, IntraProfile
+
+
+def _last_entries(profiles: list[IntraProfile]) -> dict[str, datetime]:
+    """
+    The creation date of the last stored entry of each profile.
+
+    Returns:
+        dict[str, datetime]: intra_created_at keyed by login, profiles without entry are left out.
+    """
+    last = CorrectionPointHistoric.objects.filter(profile=OuterRef("pk")).order_by(
+        "-intra_created_at", "-intra_id"
+    )
+    rows = (
+        IntraProfile.objects.filter(pk__in=[p.pk for p in profiles])
+        .annotate(last_created_at=Subquery(last.values("intra_created_at")[:1]))
+        .filter(last_created_at__isnull=False)
+        .values_list("login", "last_created_at")
+    )
+
+    return dict(rows)
+
+
+async def _fetch_hists(since: dict[str, datetime | None]) -> BulkFetchResult:
+    """
+    Fetches the history entries of each login created since the given date,
+    at most INTRA_API["CONCURRENCY"] at a time.
+
+    Returns:
+        BulkFetchResult: The entries keyed by login, and the logins that failed.
+    """
+    async with AsyncIntra() as api:
+        return await api.gather_correction_point_hists(list(since), since=since)
+
+
+def sync_correction_point_ledger(profiles: list[IntraProfile]) -> list[str]:
+    """
+    Brings the ledger of the profiles up to date.
+    Every profile is fetched, from its last stored entry on: an unchanged total
+    does not mean no entry was added, gains and spendings can cancel out.
+
+    Args:
+        profiles (list[IntraProfile]): The profiles to sync.
+
+    Returns:
+        list[str]: The logins whose history could not be fetched, their ledger is not up to date.
+    """
+    last_entries = _last_entries(profiles)
+    since = {profile.login: last_entries.get(profile.login) for profile in profiles}
+    if not since:
+        return []
+
+    console.log(f"Fetching correction point history of {len(since)} cadets")
+    hists = asyncio.run(_fetch_hists(since))
+    by_login = {profile.login: profile for profile in profiles}
+    entries = []
+    for login, e in hists.failures.items():
+        console.log(f"Getting correction point history {login=} Failed! {e!r}")
+    for login, hist in hists.results.items():
+        entries += [
+            CorrectionPointHistoric(
+                profile=by_login[login],
+                intra_id=entry["id"],
+                reason=entry["reason"],
+                sum=entry["sum"],
+                total=entry["total"],
+                scale_team_id=entry.get("scale_team_id"),
+                intra_created_at=isoparse(entry["created_at"]),
+            )
+            for entry in hist
+        ]
+    # the boundary entry of each incremental window is fetched again
+    CorrectionPointHistoric.objects.bulk_create(
+        entries, ignore_conflicts=True, batch_size=1000
+    )
+
+    return list(hists.failures)
+
+
+def ledger_eval_pts_gainloss(
+    profiles: list[IntraProfile], failed: Iterable[str] = ()
+) -> dict[str, tuple[int, int] | None]:
+    """
+    Evaluation points gained as evaluator and lost as evaluated, summed in SQL over the ledger.
+
+    Args:
+        profiles (list[IntraProfile]): The profiles.
+        failed (Iterable[str], optional): Logins whose ledger could not be synced, see sync_correction_point_ledger.
+
+    Returns:
+        dict[str, tuple[int, int] | None]: (pts_gain, pts_lost) keyed by login, (0, 0) for profiles without entry,
+            None for the failed logins, their sums would be stale or missing.
+    """
+    rows = (
+        CorrectionPointHistoric.objects.filter(profile__in=profiles)
+        .values("profile__login")
+        .annotate(
+            gain=Sum("sum", filter=Q(reason=EARNING_REASON), default=0),
+            lost=Sum("sum", filter=Q(reason=SPENDING_REASON), default=0),
+        )
+        .values_list("profile__login", "gain", "lost")
+    )
+    ret = {profile.login: (0, 0) for profile in profiles}
+    ret.update({login: (gain, abs(lost)) for login, gain, lost in rows})
+    ret.update({login: None for login in failed})
+
+    return ret
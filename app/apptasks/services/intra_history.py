@@ -0,0 +1,131 @@
+"""
+Change-only storage of HistIntraProfileData.
+
+Ingest only adds a row when the content hash of a user info differs from the
+latest one, see apptasks.services.update_intraprofile.ingest_user_infos.
+The latest row of each profile is always full. Once superseded, it becomes a
+delta against the last full row before it, unless CHECKPOINT_EVERY deltas
+already hang off that row or the delta is not worth it: it then stays full and
+serves as the next checkpoint. Any version is one patch away from full data,
+see HistIntraProfileData.get_data.
+
+Every row also keeps a few figures of its data in `metrics`, so time-series
+read them in SQL whether the row is full or a delta. Rows stored before
+metrics existed are filled by backfill_metrics, run after deploy.
+"""
+
+import json
+
+from django.db.models import Count, OuterRef, Subquery
+
+from appcore.services import json_delta
+from appdata.models.intras import HistIntraProfileData
+
+# deltas per full row, bounds how far a delta drifts from its base
+CHECKPOINT_EVERY = 30
+
+
+def snapshot_metrics(data: dict) -> dict:
+    """
+    The figures of a user info kept for time-series.
+
+    Returns:
+        dict: level and blackholed_at keyed by cursus_id (as str),
+            correction_point and the number of validated projects.
+    """
+    level = {}
+    blackholed_at = {}
+    for cursus_user in data["cursus_users"]:
+        cursus_id = str(cursus_user["cursus_id"])
+        level.setdefault(cursus_id, cursus_user["level"])
+        blackholed_at.setdefault(cursus_id, cursus_user["blackholed_at"])
+
+    return {
+        "level": level,
+        "blackholed_at": blackholed_at,
+        "correction_point": data["correction_point"],
+        "validated_projects": sum(
+            1 for pu in data["projects_users"] if pu.get("validated?")
+        ),
+    }
+
+
+def compact_superseded(hist_ids: list) -> int:
+    """
+    Turns superseded full rows into deltas against their checkpoint.
+    Rows still pointed at by IntraProfile.latest_data are left full.
+
+    Args:
+        hist_ids (list): The pks of rows that were the latest of their profile.
+
+    Returns:
+        int: The number of rows turned into deltas.
+    """
+    checkpoint = HistIntraProfileData.objects.filter(
+        profile=OuterRef("profile"),
+        base__isnull=True,
+        created__lt=OuterRef("created"),
+    ).order_by("-created")
+    superseded = list(
+        HistIntraProfileData.objects.filter(
+            pk__in=hist_ids, base__isnull=True, latest_of__isnull=True
+        ).annotate(checkpoint_id=Subquery(checkpoint.values("pk")[:1]))
+    )
+    checkpoints = (
+        HistIntraProfileData.objects.filter(
+            pk__in=[hist.checkpoint_id for hist in superseded]
+        )
+        .annotate(n_deltas=Count("deltas"))
+        .in_bulk()
+    )
+
+    compacted = []
+    for hist in superseded:
+        base = checkpoints.get(hist.checkpoint_id)
+        if base is None or base.n_deltas + 1 >= CHECKPOINT_EVERY:
+            continue
+        delta = json_delta.diff(base.data, hist.data)
+        if len(json.dumps(delta)) * 2 > len(json.dumps(hist.data)):
+            continue
+        # the full data is dropped, so the delta must rebuild it exactly
+        expected = hist.data_hash or json_delta.content_hash(hist.data)
+        if json_delta.content_hash(json_delta.patch(base.data, delta)) != expected:
+            continue
+        hist.base = base
+        hist.delta = delta
+        hist.data = None
+        base.n_deltas += 1
+        compacted.append(hist)
+    HistIntraProfileData.objects.bulk_update(
+        compacted, ["base", "delta", "data"], batch_size=500
+    )
+
+    return len(compacted)
+
+
+def backfill_metrics(batch_size: int = 500) -> int:
+    """
+    Fills the metrics of rows stored before they existed, batch_size rows per transaction.
+    Rows already filled are skipped, so it can be stopped and run again.
+
+    Returns:
+        int: The number of rows filled.
+    """
+    ret = 0
+    last_pk = None
+    while True:
+        qs = (
+            HistIntraProfileData.objects.filter(metrics={})
+            .select_related("base")
+            .order_by("pk")
+        )
+        if last_pk is not None:
+            qs = qs.filter(pk__gt=last_pk)
+        hists = list(qs[:batch_size])
+        if not hists:
+            return ret
+        for hist in hists:
+            hist.metrics = snapshot_metrics(hist.get_data())
+        HistIntraProfileData.objects.bulk_update(hists, ["metrics"])
+        ret += len(hists)
+        last_pk = hists[-1].pk
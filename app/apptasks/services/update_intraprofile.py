@@ -1,16 +1,390 @@
-from datetime import datetime
+import asyncio
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from datetime import datetime, timedelta
+from typing import Callable, Iterable
 
+import httpx
+
+from dateutil.parser import isoparse
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from appcore.services import json_delta
 from appcore.services.date_utils import month_range_from_now
+from appcore.services.intra.async_intra import AsyncIntra
+from appcore.services.intra.bulk import BulkFetchResult
 from appcore.services.intra.intra import Intra
+from appcore.services.intra.retries import is_transient
+from appcore.services.response_cache import bump_data_generation
 from appcore.services.console import console
-from appdata.models.intras import HistIntraProfileData, IntraProfile
+from appdata.models.intras import HistIntraProfileData, IntraCursusUser, IntraProfile
+from apptasks.services.intra_history import compact_superseded, snapshot_metrics
+
+CAMPUS_ID = 33
+LAST_SYNC_KEY = "update_intraprofile:last-sync"
+LAST_FULL_SYNC_KEY = "update_intraprofile:last-full-sync"
+# logins that could not be fetched, re-queued on the next run
+FAILED_LOGINS_KEY = "update_intraprofile:failed-logins"
+# a full reconciliation runs at least this often
+FULL_SYNC_EVERY = timedelta(days=7)
+# overlap between incremental windows, covers clock skew and in-flight updates
+SYNC_WINDOW_MARGIN = timedelta(minutes=10)
+# user infos stored per transaction
+INGEST_BATCH_SIZE = 500
+# IntraProfile columns refreshed when an existing profile is upserted
+PROFILE_UPDATE_FIELDS = [
+    "login",
+    "pool_month",
+    "pool_year",
+    "cursus_ids",
+    "email",
+    "first_name",
+    "last_name",
+    "correction_point",
+    "latest_data",
+    "updated",
+]
+
+
+def _is_tracked(user: dict, cursus_id: int) -> bool:
+    """
+    Whether a user listed in the cursus should be synced.
+    Pisciners are only tracked around the current pool.
+    """
+    if cursus_id != 9 and cursus_id != 3:
+        return True
+    if user.get("pool_year") is None or user.get("pool_month") is None:
+        return False
+
+    return int(user["pool_year"]) == datetime.now().year and user[
+        "pool_month"
+    ] in month_range_from_now(2)
+
+
+def _sources(
+    base: str, cursus_ids: list[int], since: datetime | None
+) -> list[tuple[int, str, dict, Callable[[dict], dict]]]:
+    """
+    The listings to scan for logins to sync, as (cursus_id, url, params, get_user).
+    A full sync lists every user of each cursus. An incremental sync only lists
+    users, cursus_users and projects_users updated since `since`.
+    """
+    if since is None:
+        return [
+            (
+                cursus_id,
+                f"{base}/cursus/{cursus_id}/users/",
+                {"filter[primary_campus_id]": CAMPUS_ID},
+                lambda user: user,
+            )
+            for cursus_id in cursus_ids
+        ]
+
+    window = {"range[updated_at]": f"{since.isoformat()},{timezone.now().isoformat()}"}
+    ret = []
+    for cursus_id in cursus_ids:
+        ret += [
+            (
+                cursus_id,
+                f"{base}/cursus/{cursus_id}/users/",
+                {"filter[primary_campus_id]": CAMPUS_ID, **window},
+                lambda user: user,
+            ),
+            (
+                cursus_id,
+                f"{base}/cursus/{cursus_id}/cursus_users",
+                {"filter[campus_id]": CAMPUS_ID, **window},
+                lambda cursus_user: cursus_user["user"],
+            ),
+            (
+                cursus_id,
+                f"{base}/projects_users",
+                {"filter[campus]": CAMPUS_ID, "filter[cursus]": cursus_id, **window},
+                lambda project_user: project_user["user"],
+            ),
+        ]
+
+    return ret
+
+
+async def _fetch_user_infos(
+    cursus_ids: list[int],
+    since: datetime | None = None,
+    logins: list[str] = None,
+    on_batch: Callable[[list[dict]], None] = None,
+) -> BulkFetchResult:
+    """
+    Streams the listings of every cursus and fetches each new login's full user info
+    while the remaining pages are still downloading.
+    Fetches are bounded by INTRA_API["CONCURRENCY"].
+    Args:
+        cursus_ids: The cursus to sync.
+        since: Only sync users changed since then, None for everyone.
+        logins: Logins to fetch regardless of the listings.
+        on_batch: Called with every INGEST_BATCH_SIZE user infos fetched, and the rest at the end.
+            It runs in the event loop, so it must not block, see _fetch_and_ingest.
+    Returns:
+        User infos keyed by login, and the logins that failed.
+    """
+    pending = []
+
+    def _flush():
+        nonlocal pending
+        batch, pending = pending, []
+        if on_batch is not None:
+            on_batch(batch)
+
+    def _on_result(login, user_info):
+        pending.append(user_info)
+        if len(pending) >= INGEST_BATCH_SIZE:
+            _flush()
+
+    async with AsyncIntra() as api:
+
+        async def _logins():
+            seen = set()
+            for login in logins or []:
+                seen.add(login)
+                yield login
+            for cursus_id, url, params, get_user in _sources(
+                api.BASE, cursus_ids, since
+            ):
+                async for item in api.iter_items(url, params):
+                    user = get_user(item)
+                    if user["login"] in seen or not _is_tracked(user, cursus_id):
+                        continue
+                    seen.add(user["login"])
+                    yield user["login"]
+
+        try:
+            ret = await api.gather_users(_logins(), on_result=_on_result)
+        finally:
+            # also when a listing fails, what was fetched is still handed over
+            if pending:
+                _flush()
+    console.log(f"Logins fetched: {len(ret.results)}, failed: {len(ret.failures)}")
+
+    return ret
+
+
+def _fetch_and_ingest(
+    cursus_ids: list[int],
+    since: datetime | None,
+    logins: list[str] | None,
+    ingest: Callable[[list[dict]], object],
+) -> BulkFetchResult:
+    """
+    Runs _fetch_user_infos in a thread of its own and ingests its batches in this one
+    as they arrive, so a sync cut short still keeps what it fetched, and the
+    database work stays on the connection, and in the transaction, of the caller.
+    Returns:
+        The result of _fetch_user_infos, every fetched user info already ingested.
+    """
+    batches = queue.Queue()
+    stop = threading.Event()
+    running = {}
+
+    async def _main():
+        running["loop"] = asyncio.get_running_loop()
+        running["task"] = asyncio.current_task()
+        if stop.is_set():
+            raise asyncio.CancelledError()
+        return await _fetch_user_infos(cursus_ids, since, logins, batches.put)
+
+    pool = ThreadPoolExecutor(1)
+    future = pool.submit(copy_context().run, asyncio.run, _main())
+    future.add_done_callback(lambda _: batches.put(None))
+    try:
+        while (batch := batches.get()) is not None:
+            ingest(batch)
+    finally:
+        # on an ingest error or a time limit, stop fetching into a queue nobody reads
+        stop.set()
+        if not future.done() and "task" in running:
+            try:
+                running["loop"].call_soon_threadsafe(running["task"].cancel)
+            except RuntimeError:
+                # the loop closed in the meantime
+                pass
+        pool.shutdown(wait=True)
+
+    return future.result()
+
+
+def _parse_date(value: str | None) -> datetime | None:
+    return isoparse(value) if value else None
+
+
+def _cursus_users(
+    intra_profile: IntraProfile, user_info: dict
+) -> list[IntraCursusUser]:
+    """
+    The cursus rows of a user info, the first entry listed wins.
+    """
+    ret = {}
+    for cursus_user in user_info["cursus_users"]:
+        ret.setdefault(
+            cursus_user["cursus_id"],
+            IntraCursusUser(
+                profile=intra_profile,
+                cursus_id=cursus_user["cursus_id"],
+                cursus_slug=cursus_user["cursus"]["slug"],
+                level=cursus_user["level"] or 0,
+                grade=cursus_user.get("grade"),
+                begin_at=_parse_date(cursus_user.get("begin_at")),
+                blackholed_at=_parse_date(cursus_user["blackholed_at"]),
+            ),
+        )
 
+    return list(ret.values())
 
-def update_intraprofile() -> bool:
+
+def _ingest_batch(user_infos: list[dict]) -> list[IntraProfile]:
+    """
+    Stores a batch of user infos in one transaction, see ingest_user_infos.
+    Profiles are upserted with a single INSERT ... ON CONFLICT (intra_id) DO UPDATE,
+    snapshots and cursus rows with one INSERT each.
+    Returns:
+        The updated profiles.
+    """
+    with transaction.atomic():
+        latest = {
+            intra_id: (latest_data_id, data_hash)
+            for intra_id, latest_data_id, data_hash in IntraProfile.objects.filter(
+                intra_id__in=[user_info["id"] for user_info in user_infos],
+                latest_data__isnull=False,
+            ).values_list("intra_id", "latest_data_id", "latest_data__data_hash")
+        }
+        changed = []
+        intra_profiles = []
+        hist_intra_profile_data_s = []
+        unchanged = []
+        superseded = []
+        for user_info in user_infos:
+            data_hash = json_delta.content_hash(user_info)
+            latest_data_id, latest_hash = latest.get(user_info["id"], (None, None))
+            if data_hash == latest_hash:
+                unchanged.append(latest_data_id)
+                continue
+            if latest_data_id is not None:
+                superseded.append(latest_data_id)
+            hist_intra_profile_data = HistIntraProfileData(
+                data=user_info,
+                data_hash=data_hash,
+                metrics=snapshot_metrics(user_info),
+            )
+            # the snapshot is inserted below, the foreign key is checked on commit
+            intra_profiles.append(
+                IntraProfile(
+                    intra_id=user_info["id"],
+                    login=user_info["login"],
+                    pool_month=user_info["pool_month"],
+                    pool_year=user_info["pool_year"],
+                    cursus_ids=[
+                        cursus["cursus_id"] for cursus in user_info["cursus_users"]
+                    ],
+                    email=user_info["email"],
+                    first_name=user_info["first_name"],
+                    last_name=user_info["last_name"],
+                    correction_point=user_info["correction_point"],
+                    latest_data_id=hist_intra_profile_data.pk,
+                )
+            )
+            hist_intra_profile_data_s.append(hist_intra_profile_data)
+            changed.append(user_info)
+        HistIntraProfileData.objects.filter(pk__in=unchanged).update(
+            updated=timezone.now()
+        )
+        if not intra_profiles:
+            return []
+
+        IntraProfile.objects.bulk_create(
+            intra_profiles,
+            update_conflicts=True,
+            unique_fields=["intra_id"],
+            update_fields=PROFILE_UPDATE_FIELDS,
+        )
+        # existing profiles keep their pk, which the upsert does not return
+        pks = dict(
+            IntraProfile.objects.filter(
+                intra_id__in=[
+                    intra_profile.intra_id for intra_profile in intra_profiles
+                ]
+            ).values_list("intra_id", "pk")
+        )
+        cursus_users = []
+        for intra_profile, hist_intra_profile_data, user_info in zip(
+            intra_profiles, hist_intra_profile_data_s, changed
+        ):
+            intra_profile.pk = pks[intra_profile.intra_id]
+            hist_intra_profile_data.profile = intra_profile
+            cursus_users += _cursus_users(intra_profile, user_info)
+        HistIntraProfileData.objects.bulk_create(hist_intra_profile_data_s)
+        IntraCursusUser.objects.filter(profile__in=intra_profiles).delete()
+        IntraCursusUser.objects.bulk_create(cursus_users)
+        compact_superseded(superseded)
+
+    return intra_profiles
+
+
+def ingest_user_infos(user_infos: Iterable[dict]) -> list[IntraProfile]:
+    """
+    Stores fetched user infos whose content hash changed: upserts each IntraProfile
+    and its IntraCursusUser rows, adds a HistIntraProfileData snapshot, points
+    IntraProfile.latest_data at it and compacts the previous one.
+    Unchanged user infos only bump the `updated` of the latest snapshot.
+    Runs in batches of INGEST_BATCH_SIZE, one transaction each.
+    Args:
+        user_infos: User infos as returned by /users/:id.
+    Returns:
+        The updated profiles.
+    """
+    user_infos = list(user_infos)
+    intra_profiles = []
+    for i in range(0, len(user_infos), INGEST_BATCH_SIZE):
+        intra_profiles += _ingest_batch(user_infos[i : i + INGEST_BATCH_SIZE])
+    console.log(
+        f"Snapshots: {len(intra_profiles)} changed, "
+        f"{len(user_infos) - len(intra_profiles)} unchanged"
+    )
+
+    return intra_profiles
+
+
+def _sync_since(full: bool | None) -> datetime | None:
+    """
+    Resolves the start of the incremental window.
+    Returns:
+        The last successful sync minus a margin, None when a full sync is due.
+    """
+    last_sync = cache.get(LAST_SYNC_KEY)
+    last_full_sync = cache.get(LAST_FULL_SYNC_KEY)
+    if full is None:
+        full = (
+            last_sync is None
+            or last_full_sync is None
+            or timezone.now() - last_full_sync > FULL_SYNC_EVERY
+        )
+    if full or last_sync is None:
+        return None
+
+    return last_sync - SYNC_WINDOW_MARGIN
+
+
+def update_intraprofile(full: bool | None = None) -> bool:
     """
     Updates the intra profile of all cadets
+    Only users changed since the last successful sync are fetched,
+    with a full reconciliation every FULL_SYNC_EVERY.
+    Args:
+        full: True to force a full sync, False to force an incremental one, None to decide automatically
     Returns:
-        True if successful
+        True if successful, False if some cadets could not be fetched.
+        Those are logged, the others are saved, and they are retried on the next run.
     cursus id 75 Pro training - AI
     cursus id 74 Pro training - Cybersecurity
     cursus id 21 Main cursus
@@ -20,55 +394,52 @@ def update_intraprofile() -> bool:
     """
     CURSUS_IDS = [
         9,
-        3, # disabled due to possbly be the cause of 500s
+        3,  # disabled due to possbly be the cause of 500s
         21,
         74,
         75,
         69,
     ]
-    FILTER = {
-        "filter[primary_campus_id]": 33,
-    }
-
-    intra = Intra()
-    curr_year = datetime.now().year
-    logins = []
-    for cursus_id in CURSUS_IDS:
-        users = intra.get_users_by_cursus_id(cursus_id, filter=FILTER)
-        if cursus_id == 9 or cursus_id == 3:
-            for user in users:
-                if user["pool_year"] is None or user["pool_month"] is None:
-                    continue
-                if int(user["pool_year"]) == curr_year and user[
-                    "pool_month"
-                ] in month_range_from_now(2):
-                    logins.append(user["login"])
-        else:
-            logins += [i["login"] for i in users]
-    logins = list(set(logins))
-    console.log(f"Logins to fetch: {len(logins)}")
-    user_infos = intra.get_user_infos_thr(logins)
-    hist_intra_profile_data_s = []
-    for user_info in user_infos:
-        intra_profile, _ = IntraProfile.objects.get_or_create(
-            intra_id=user_info["id"],
+
+    started = timezone.now()
+    since = _sync_since(full)
+    console.log(f"Syncing {'since ' + since.isoformat() if since else 'everyone'}")
+    changed = []
+
+    def _ingest(user_infos):
+        changed.extend(ingest_user_infos(user_infos))
+
+    try:
+        result = _fetch_and_ingest(
+            CURSUS_IDS, since, cache.get(FAILED_LOGINS_KEY), _ingest
         )
-        if intra_profile.login != user_info["login"]:
-            intra_profile.login = user_info["login"]
-        intra_profile.pool_month = user_info["pool_month"]
-        intra_profile.pool_year = user_info["pool_year"]
-        intra_profile.cursus_ids = [
-            cursus["cursus_id"] for cursus in user_info["cursus_users"]
-        ]
-        intra_profile.save()
-        hist_intra_profile_data_s.append(
-            HistIntraProfileData(
-                profile=intra_profile,
-                data=user_info,
+        if not result.ok:
+            retried = Intra().get_user_infos(
+                [
+                    login
+                    for login, e in result.failures.items()
+                    if is_transient("GET", e)
+                ],
+                rounds=1,
             )
-        )
-    HistIntraProfileData.objects.bulk_create(
-        hist_intra_profile_data_s, ignore_conflicts=True
-    )
+            _ingest(retried.results.values())
+            result.merge(retried)
+    finally:
+        # cached responses of the data routes are stale once a batch changed something
+        if changed:
+            bump_data_generation()
+    for login, e in result.failures.items():
+        console.log(f"Getting user {login=} Failed! {e!r}")
+
+    # users gone from intra are not worth retrying
+    retry_logins = [
+        login
+        for login, e in result.failures.items()
+        if not (isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 404)
+    ]
+    cache.set(FAILED_LOGINS_KEY, retry_logins, None)
+    cache.set(LAST_SYNC_KEY, started, None)
+    if since is None:
+        cache.set(LAST_FULL_SYNC_KEY, started, None)
 
-    return True
+    return result.ok
@@ -1,11 +1,11 @@
 import io
+from datetime import timedelta
 from celery import shared_task
 import pandas as pd
-from dateutil.parser import parser
 from django.utils import timezone
 from discord_webhook import DiscordEmbed, DiscordWebhook
 
-from appdata.models.intras import HistIntraProfileData
+from appdata.models.intras import IntraCursusUser
 from apptasks.models.configs import DiscordWebhook as DiscordWebhookModel
 
 
@@ -21,47 +21,29 @@ def bh_chaser() -> bool:
             "Discord webhook: notifications not found, add it in DjangoAdmin"
         )
 
-    filters = {
-        "profile__cursus_ids__contains": [21],
+    # cadets with a blackhole, from the cursus rows kept by ingest, see IntraCursusUser
+    columns = {
+        "login": "profile__login",
+        "level": "level",
+        "pool_month": "profile__pool_month",
+        "pool_year": "profile__pool_year",
+        "email": "profile__email",
+        "first_name": "profile__first_name",
+        "last_name": "profile__last_name",
+        "blackholed_at": "blackholed_at",
     }
+    now = timezone.now()
     qs = (
-        HistIntraProfileData.objects.filter(**filters)
-        .order_by("profile", "-created")
-        .distinct("profile")
+        IntraCursusUser.objects.filter(
+            cursus_id=21, blackholed_at__gte=now - timedelta(days=1)
+        )
+        .order_by("blackholed_at")
+        .values_list(*columns.values())
     )
 
-    # get users with bh not None
-    bh_data = []
-    for profile in qs:
-        for cursus_user in profile.data["cursus_users"]:
-            if cursus_user["cursus_id"] == 21:
-                blackholed_at = cursus_user["blackholed_at"]
-                level = cursus_user["level"]
-        if blackholed_at is not None:
-            login = profile.data["login"]
-            pool_month = profile.data["pool_month"]
-            pool_year = profile.data["pool_year"]
-            email = profile.data["email"]
-            first_name = profile.data["first_name"]
-            last_name = profile.data["last_name"]
-            bh_data.append(
-                {
-                    "login": login,
-                    "level": level,
-                    "pool_month": pool_month,
-                    "pool_year": pool_year,
-                    "email": email,
-                    "first_name": first_name,
-                    "last_name": last_name,
-                    "blackholed_at": parser().parse(blackholed_at),
-                }
-            )
-
     # filter bh_data
-    df = pd.DataFrame(bh_data).sort_values("blackholed_at")
-    df["bh_in"] = df["blackholed_at"] - timezone.now()
-    df["bh_in"] = df["bh_in"].dt.days
-    df = df[df["bh_in"] >= -1]
+    df = pd.DataFrame(list(qs), columns=list(columns))
+    df["bh_in"] = (pd.to_datetime(df["blackholed_at"], utc=True) - now).dt.days
     df_14 = df[df["bh_in"] <= 14]
     df_14_30 = df[(df["bh_in"] > 14) & (df["bh_in"] <= 30)]
     df_45 = df[df["bh_in"] <= 45]
@@ -1,14 +1,17 @@
 import logging
-import threading
-from time import sleep
 
 import pandas as pd
 from celery import shared_task
 from pydantic import validate_call
 
+from appcore.services.intra.cohorts import cohort_metrics
 from appcore.services.intra.intra import Intra
-from appcore.services.intra.user import IntraUser
+from appcore.services.intra.snapshot import IntraUserSnapshot
 from appdata.models.intras import IntraProfile
+from apptasks.services.correction_points import (
+    ledger_eval_pts_gainloss,
+    sync_correction_point_ledger,
+)
 from apptasks.tasks.utils import human_time, upload2gsheet, upload2gsheet_static
 
 logging.basicConfig(level=logging.INFO)
@@ -44,7 +47,8 @@ def snap_to_gsheet(
     logger.info("Getting cadets...")
     intra_profiles = IntraProfile.objects.filter(
         cursus_ids__contains=[cursus_id],
-    )
+        latest_data__isnull=False,
+    ).select_related("latest_data")
     if pool_month:
         intra_profiles = intra_profiles.filter(pool_month=pool_month)
     if pool_year:
@@ -53,28 +57,19 @@ def snap_to_gsheet(
         intra_profiles = intra_profiles.exclude(login__in=skip_logins)
     if only_id_after:
         intra_profiles = intra_profiles.exclude(intra_id__gte=only_id_after)
+    intra_profiles = list(intra_profiles)
     intra_users = [
-        IntraUser(profile.login, profile.histintraprofiledata_set.last().data)
+        IntraUserSnapshot(profile.latest_data.data, profile.login)
         for profile in intra_profiles
     ]
 
     # Hydrate pts_gain and pts_lost for each intra user
     logger.info("Hydrating pts_gain and pts_lost for each intra user...")
-
-    def _hydrate_pts_gain_loss(user):
-        user.calc_eval_pts_gainloss()
-
-    thrs = []
-    for user in intra_users:
-        thr = threading.Thread(target=_hydrate_pts_gain_loss, args=(user,))
-        thrs.append(thr)
-
-    for thr in thrs:
-        thr.start()
-        sleep(0.5)  # prevents rate limit
-
-    for thr in thrs:
-        thr.join()
+    failed = sync_correction_point_ledger(intra_profiles)
+    # cells of cadets whose history could not be fetched are left empty
+    eval_pts = ledger_eval_pts_gainloss(intra_profiles, failed)
+    # days inactive and total tries of the whole cohort at once
+    metrics = cohort_metrics(intra_users, cursus_id)
 
     # Get project slugs
     logger.info("Getting project slugs...")
@@ -85,7 +80,7 @@ def snap_to_gsheet(
 
     # prep df payload
     df_data = []
-    for user in intra_users:
+    for user, m in zip(intra_users, metrics.itertuples()):
         d = {
             "email": user.data["email"],
             "login": user.data["login"],
@@ -93,14 +88,12 @@ def snap_to_gsheet(
             "first_name": user.data["first_name"],
             "last_name": user.data["last_name"],
             "profile_url": f'https://profile.intra.42.fr/users/{user.data["login"]}',
-            "inactive_for": user.get_days_since_last_active_date_by_project_update(
-                cursus_id=cursus_id
-            ),
+            "inactive_for": m.inactive_for,
             "level": user.level(cursus_id=cursus_id),
             "correction_point": user.data["correction_point"],
-            "as_evaluator": user.pts_gain,
-            "as_evaluated": user.pts_lost,
-            "total_tries": user.calc_total_tries(cursus_id=cursus_id),
+            "as_evaluator": (eval_pts[user.login] or (None, None))[0],
+            "as_evaluated": (eval_pts[user.login] or (None, None))[1],
+            "total_tries": m.total_tries,
         }
         # project score, completed date
         for s in slugs:
@@ -13,7 +13,12 @@ def update_intraprofile() -> bool:
     """
     count = 0
     try:
-        _update_intraprofile()
+        if not _update_intraprofile():
+            send_simple_message(
+                "update_intraprofile(); Some cadets failed, retrying them next run",
+                "dev",
+            )
+            return False
         send_simple_message("update_intraprofle(); Bonjour", "dev")
     except Exception as e:
         send_simple_message(f"update_intraprofile(); Error: {e}", "dev")